@@ -1,47 +1,58 @@
 import re
-from langchain.prompts import PromptTemplate
-from langchain_upstage import ChatUpstage
+from concurrent.futures import Future
+from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from context_packing import SLOT_TOKEN_BUDGET, pack_summaries
+from digests import corpus_hash, model_identity, prompt_hash, resolve_context
+from prefetch import cancel, join, prefetch_context
+from red_flags import format_red_flag_result, screen_red_flags
+from response_cache import response_key
+from streaming import print_stream_stats, stream_chain
+from tracing import tracer
+
+DIAGNOSIS_DOC_INDICES = [0, 1, 2, 5]
+DIAGNOSIS_QUERIES = ["symptoms, findings, diagnoses, evaluations related to neck pain"]
+
+QUESTIONS = [
+    ("patient's chief complaint", "Enter patient's chief complaint: ", lambda x: len(x) > 0),
+    ("patient's location", "Enter patient's pain location (e.g. Middle, right): ", lambda x: len(x) > 0),
+    ("patient's radiation", "Is there pain radiation? (Yes/No, and location if Yes): ", lambda x: x.lower() in ['yes', 'no'] or (x.lower().startswith('yes') and len(x) > 3)),
+    ("patient's severity", "Enter pain severity (mild/moderate/severe): ", lambda x: re.search(r'\b(extremely\s+)?(mild|moderate|severe)\b', x.lower()) is not None),
+    ("patient's alleviating factors", "Is pain reduced by lying down? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's pain increase", "Pain increase when looking at (aching/opposite/same) side: ", lambda x: x.lower() in ['aching', 'opposite', 'same']),
+    ("patient's numbness or tingling", "Numbness or tingling in arm or hand? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's weakness", "Weaker or thinner arm than before? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's onset of pain", "When did the pain start? ", lambda x: len(x) > 0),
+    ("patient's trauma history", "Did pain start within 1 day of trauma? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's lower back pain", "Pain also in lower back? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's morning stiffness", "Stiffness in morning? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's leg symptoms", "Leg weakness or pain? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's coronary heart disease history", "History of coronary heart disease? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's weight loss/appetite", "Weight loss or decreased appetite? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's pregnancy/breastfeeding", "Pregnant or breast feeding? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's prolonged sitting", "Prolonged sitting during work? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's fever", "Fever? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's cancer/steroid history", "History of cancer or steroid use? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's osteoporosis", "Osteoporosis? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's age", "Patient's age: ", lambda x: x.isdigit() and 0 < int(x) < 120),
+    ("patient's alcohol/drug use", "Alcoholic or drug abuse? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's HIV status", "HIV? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's leg bending difficulty", "Difficult to bend leg? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's urinary/fecal incontinence", "Urinary or fecal incontinence? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's shoulder drooping or winging", "Shoulder drooping or winging? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's upper neck tenderness", "Tenderness at upper neck? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's arm lift score", "Arm lift against gravity score (0-5): ", lambda x: x.isdigit() and 0 <= int(x) <= 5),
+    ("patient's Babinski Reflex", "Babinski Reflex (positive/negative): ", lambda x: x.lower() in ['positive', 'negative']),
+    ("patient's sensation in arms", "Sensation difference between arms? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
+    ("patient's Spurling test", "Spurling test result (positive/negative): ", lambda x: x.lower() in ['positive', 'negative'])
+]
+
 def get_user_input():
     patient_info = {}
-    questions = [
-        ("patient's chief complaint", "Enter patient's chief complaint: ", lambda x: len(x) > 0),
-        ("patient's location", "Enter patient's pain location (e.g. Middle, right): ", lambda x: len(x) > 0),
-        ("patient's radiation", "Is there pain radiation? (Yes/No, and location if Yes): ", lambda x: x.lower() in ['yes', 'no'] or (x.lower().startswith('yes') and len(x) > 3)),
-        ("patient's severity", "Enter pain severity (mild/moderate/severe): ", lambda x: re.search(r'\b(extremely\s+)?(mild|moderate|severe)\b', x.lower()) is not None),
-        ("patient's alleviating factors", "Is pain reduced by lying down? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's pain increase", "Pain increase when looking at (aching/opposite/same) side: ", lambda x: x.lower() in ['aching', 'opposite', 'same']),
-        ("patient's numbness or tingling", "Numbness or tingling in arm or hand? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's weakness", "Weaker or thinner arm than before? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's onset of pain", "When did the pain start? ", lambda x: len(x) > 0),
-        ("patient's trauma history", "Did pain start within 1 day of trauma? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's lower back pain", "Pain also in lower back? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's morning stiffness", "Stiffness in morning? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's leg symptoms", "Leg weakness or pain? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's coronary heart disease history", "History of coronary heart disease? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's weight loss/appetite", "Weight loss or decreased appetite? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's pregnancy/breastfeeding", "Pregnant or breast feeding? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's prolonged sitting", "Prolonged sitting during work? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's fever", "Fever? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's cancer/steroid history", "History of cancer or steroid use? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's osteoporosis", "Osteoporosis? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's age", "Patient's age: ", lambda x: x.isdigit() and 0 < int(x) < 120),
-        ("patient's alcohol/drug use", "Alcoholic or drug abuse? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's HIV status", "HIV? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's leg bending difficulty", "Difficult to bend leg? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's urinary/fecal incontinence", "Urinary or fecal incontinence? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's shoulder drooping or winging", "Shoulder drooping or winging? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's upper neck tenderness", "Tenderness at upper neck? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's arm lift score", "Arm lift against gravity score (0-5): ", lambda x: x.isdigit() and 0 <= int(x) <= 5),
-        ("patient's Babinski Reflex", "Babinski Reflex (positive/negative): ", lambda x: x.lower() in ['positive', 'negative']),
-        ("patient's sensation in arms", "Sensation difference between arms? (Yes/No): ", lambda x: x.lower() in ['yes', 'no']),
-        ("patient's Spurling test", "Spurling test result (positive/negative): ", lambda x: x.lower() in ['positive', 'negative'])
-    ]
-
-    total_questions = len(questions)
-
-    for i, (key, question, validator) in enumerate(questions, 1):
+    total_questions = len(QUESTIONS)
+
+    for i, (key, question, validator) in enumerate(QUESTIONS, 1):
         while True:
             answer = input(question)
             if validator(answer):
@@ -54,6 +65,31 @@ def get_user_input():
 
     return patient_info
 
+def validate_patient_data(patient_data):
+    """
+    Checks a pre-filled intake against the same validators get_user_input uses.
+
+    :param patient_data: Dict mapping question keys to answers
+    :return: Dict with only the known question keys, answers as strings
+    :raises ValueError: If any answer is missing or invalid
+    """
+    errors = []
+    validated = {}
+    for key, question, validator in QUESTIONS:
+        answer = patient_data.get(key)
+        if answer is None:
+            errors.append(f"missing answer for {key!r}")
+            continue
+        answer = str(answer).strip()
+        if not validator(answer):
+            errors.append(f"invalid answer for {key!r}: {answer!r}")
+            continue
+        validated[key] = answer
+
+    if errors:
+        raise ValueError("; ".join(errors))
+    return validated
+
 def create_prompt_template():
     template = """
     You are a renowned rehabilitation medicine specialist. Check the patient's condition and suggest suspected diagnoses, further evaluations, and red flags based on the condition. Reference the provided pain guides during this process.
@@ -166,14 +202,36 @@ def create_example_outputs():
     finding red flags: Red flags present: "Osteoporosis". Urgent hospital visit recommended.
     """
 
-def process_documents(docs_list, queries):
-    # This function needs to be implemented based on your specific document processing logic
-    # For now, we'll return a dummy result
-    return {i: {query: f"Dummy result for document {i}, query: {query}" for query in queries} for i in range(len(docs_list))}
+def diagnose(llm, docs, patient_data, stream=False, on_token=None, response_cache=None, red_flag_screen=True,
+             result_context=None, summary_budget=SLOT_TOKEN_BUDGET, dense=None):
+    """
+    Runs the diagnosis chain for one validated intake.
 
-def Diagnosis_Process():
-    # Get user input
-    patient_data = get_user_input()
+    :param llm: Chat model
+    :param docs: Document corpus
+    :param patient_data: Dict of answers keyed like QUESTIONS
+    :param stream: Stream tokens to the terminal and on_token as they arrive
+    :param response_cache: Optional ResponseCache; intakes that canonicalize to a
+        cached one (same prompt, corpus, model and temperature) return the cached answer
+    :param red_flag_screen: Check the red flags locally first and, if any is
+        present, return the urgent-visit result without calling the LLM
+    :param result_context: Context summaries for DIAGNOSIS_DOC_INDICES, or a Future
+        of them (e.g. from prefetch_context) that is only waited for on a
+        response cache miss; resolved here when omitted
+    :param summary_budget: Token budget of each document's summaries in the prompt
+    :param dense: DenseIndexStore for hybrid retrieval, None for BM25 only
+    :return: The model's assessment text
+    """
+    if red_flag_screen:
+        flags = screen_red_flags(patient_data)
+        if flags:
+            tracer.incr("red_flags.short_circuits")
+            result = format_red_flag_result(flags)
+            if stream:
+                print(result)
+                if on_token is not None:
+                    on_token(result)
+            return result
 
     # Create prompt template and other necessary components
     prompt_template = create_prompt_template()
@@ -181,26 +239,76 @@ def Diagnosis_Process():
     physical_exam_questions = create_physical_exam_questions()
     example_outputs = create_example_outputs()
 
+    docs_list = [docs[i] for i in DIAGNOSIS_DOC_INDICES]
+
+    cache_key = None
+    if response_cache is not None:
+        template = "\n".join([prompt_template.template, history_questions, physical_exam_questions,
+                              example_outputs, prompt_hash(dense), f"summary_budget={summary_budget}"])
+        cache_key = response_key(patient_data, template, corpus_hash(docs_list), model_identity(llm))
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            tracer.incr("response_cache.hits")
+            if isinstance(result_context, Future):
+                cancel(result_context)
+            if stream:
+                print(cached)
+                if on_token is not None:
+                    on_token(cached)
+            return cached
+        tracer.incr("response_cache.misses")
+
     # Create the chain
-    llm = ChatUpstage(temperature=0)
     chain = prompt_template | llm | StrOutputParser()
 
-    # Process documents
-    docs_list = [docs[0], docs[1], docs[2], docs[5]]  # You need to define 'docs' somewhere
-    chief_complaint = "neck pain"
-    queries = [f"symptoms, findings, diagnoses, evaluations related to {chief_complaint}"]
-    result_context = process_documents(docs_list, queries)
+    # Process documents (precompiled digest, live RAG on a miss)
+    if result_context is None:
+        with tracer.span("workflow.diagnosis.context"):
+            result_context = resolve_context(docs_list, DIAGNOSIS_QUERIES, llm=llm, dense=dense)
+    elif isinstance(result_context, Future):
+        result_context = join("context", result_context)
 
     # Invoke the chain
-    result = chain.invoke({
+    inputs = {
         "history_questions": history_questions,
         "physical_exam_questions": physical_exam_questions,
         "example_outputs": example_outputs,
-        "pain guide": result_context[0],
-        "pain guide 2": result_context[1],
-        "pain guide 3": result_context[2],
-        "PTX": result_context[3],
+        "pain guide": pack_summaries(result_context[0], summary_budget),
+        "pain guide 2": pack_summaries(result_context[1], summary_budget),
+        "pain guide 3": pack_summaries(result_context[2], summary_budget),
+        "PTX": pack_summaries(result_context[3], summary_budget),
         **patient_data
-    })
+    }
+
+    with tracer.span("workflow.diagnosis.llm") as span:
+        if stream:
+            result, stats = stream_chain(chain, inputs, on_token=on_token, config=tracer.config())
+            print_stream_stats(stats)
+            span.set(**stats)
+        else:
+            result = chain.invoke(inputs, tracer.config())
+
+    if cache_key is not None:
+        response_cache.put(cache_key, result)
+    return result
+
+def Diagnosis_Process(llm, docs, stream=False, response_cache=None, dense=None):
+    # Retrieval and context summaries run in the background while the
+    # patient answers the questions
+    context_future = prefetch_context(llm, docs, DIAGNOSIS_DOC_INDICES, DIAGNOSIS_QUERIES, dense=dense)
+
+    # Get user input
+    patient_data = get_user_input()
+
+    # Red flags are answered immediately; the full assessment is optional
+    flags = screen_red_flags(patient_data)
+    if flags:
+        print(format_red_flag_result(flags))
+        if input("Would you also like the full assessment? (yes/no): ").lower() != "yes":
+            cancel(context_future)
+            return
 
-    print(result)
\ No newline at end of file
+    result = diagnose(llm, docs, patient_data, stream=stream, response_cache=response_cache,
+                      red_flag_screen=False, result_context=context_future, dense=dense)
+    if not stream:
+        print(result)
\ No newline at end of file
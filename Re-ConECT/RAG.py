@@ -1,63 +1,236 @@
-from langchain_upstage import UpstageLayoutAnalysisLoader
-from langchain_community.retrievers import BM25Retriever
-from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_upstage import ChatUpstage
-from typing import List, Dict
-
-def load_documents(pdf_files):
-    loaders = []
-    docs = []
-
-    for i, pdf_file in enumerate(pdf_files, start=1):
-        print(f"Processing file {i}: {pdf_file}")
-
-        loader = UpstageLayoutAnalysisLoader(
-            pdf_file, use_ocr=True, output_type="html"
-        )
-        loaders.append(loader)
-
-        doc = loader.load()
-        docs.append(doc)
-
-        print(f"File {i} processed successfully.")
-
-    print("All files have been processed.")
-    return docs
-
-def process_documents(docs: List[List], queries: List[str]) -> Dict[int, Dict[str, str]]:
-    text_splitter = RecursiveCharacterTextSplitter.from_language(
-        chunk_size=1000, chunk_overlap=100, language=Language.HTML
-    )
-
-    llm = ChatUpstage()
-
-    prompt_template = PromptTemplate.from_template(
-        """
-        Please provide most correct answer from the following context.
-        ---
-        Question: {question}
-        ---
-        Context: {Context}
-        """
-    )
-    chains = prompt_template | llm | StrOutputParser()
-
-    results = {}
-    for i, doc in enumerate(docs):
-        splits = text_splitter.split_documents(doc)
-        retriever = BM25Retriever.from_documents(splits)
-
-        doc_results = {}
-        for query in queries:
-            context_docs = retriever.invoke(query)
-            context = chains.invoke({"question": query, "Context": context_docs})
-            doc_results[query] = context
-            print(f"Document {i}, Query: {query}")
-            print(context)
-            print("---")
-
-        results[i] = doc_results
-
-    return results
\ No newline at end of file
+from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from bm25_index import BM25IndexStore
+from context_packing import CONTEXT_TOKEN_BUDGET, pack_documents
+from document_cache import DocumentCache
+from tracing import tracer
+
+LOADER_OPTIONS = {"use_ocr": True, "output_type": "html"}
+
+_default_cache = None
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DocumentCache()
+    return _default_cache
+
+def _quiet(*args, **kwargs):
+    pass
+
+def upstage_loader(pdf_file, **options):
+    from langchain_upstage import UpstageLayoutAnalysisLoader
+
+    return UpstageLayoutAnalysisLoader(pdf_file, **options)
+
+def _load_with_retry(loader, timeout=None, retries=0, backoff=1.0, log=print):
+    """
+    Calls loader.load(), retrying with exponential backoff on failure.
+
+    A load that exceeds the timeout is abandoned (its thread is left to finish
+    in the background) and counted as a failed attempt. Retry messages go
+    through log.
+    """
+    for attempt in range(retries + 1):
+        if timeout is None:
+            call = None
+        else:
+            call = ThreadPoolExecutor(max_workers=1)
+        try:
+            if call is None:
+                return loader.load()
+            return call.submit(loader.load).result(timeout=timeout)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            log(f"Load failed ({e!r}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+        finally:
+            if call is not None:
+                call.shutdown(wait=False)
+
+def load_documents(pdf_files, cache=None, max_workers=1, timeout=None, retries=0, backoff=1.0,
+                   loader_factory=upstage_loader, loader_options=None, verbose=True):
+    """
+    Loads each PDF with the Upstage layout analysis loader.
+
+    Parsed documents are kept in a persistent DocumentCache keyed by file
+    content and loader options, so unchanged guidelines are read from disk
+    instead of being sent through OCR again. Cache misses are parsed by a pool
+    of up to max_workers threads; the output keeps the order of pdf_files.
+
+    :param pdf_files: List of PDF file paths
+    :param cache: DocumentCache to use (default: None, uses the shared default cache; False disables caching)
+    :param max_workers: Maximum number of files parsed at the same time
+    :param timeout: Seconds allowed for a single load attempt (default: None, no limit)
+    :param retries: Number of retries after a failed or timed-out attempt
+    :param backoff: Delay in seconds before the first retry, doubled on each further retry
+    :param loader_factory: Callable (pdf_file, **loader_options) -> loader with a load() method
+    :param loader_options: Options passed to the loader factory (default: LOADER_OPTIONS)
+    :param verbose: Print progress messages
+    :return: List of document lists, in the same order as pdf_files
+    """
+    log = print if verbose else _quiet
+    if cache is None:
+        cache = get_default_cache()
+    if loader_options is None:
+        loader_options = LOADER_OPTIONS
+
+    pdf_files = list(pdf_files)
+    docs = [None] * len(pdf_files)
+    pending = []
+
+    for i, pdf_file in enumerate(pdf_files):
+        log(f"Processing file {i + 1}: {pdf_file}")
+
+        if cache:
+            with tracer.span("load_documents.cache_read", file=pdf_file):
+                doc = cache.get(pdf_file, loader_options)
+            if doc is not None:
+                tracer.incr("document_cache.hits")
+                docs[i] = doc
+                log(f"File {i + 1} loaded from cache.")
+                continue
+            tracer.incr("document_cache.misses")
+        pending.append(i)
+
+    def load_one(i):
+        with tracer.span("load_documents.parse", file=pdf_files[i]) as span:
+            loader = loader_factory(pdf_files[i], **loader_options)
+            doc = _load_with_retry(loader, timeout=timeout, retries=retries, backoff=backoff, log=log)
+            span.set(pages=len(doc))
+        if cache:
+            cache.put(pdf_files[i], loader_options, doc)
+        log(f"File {i + 1} processed successfully.")
+        return doc
+
+    if max_workers <= 1 or len(pending) <= 1:
+        for i in pending:
+            docs[i] = load_one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {i: pool.submit(load_one, i) for i in pending}
+            for i, future in futures.items():
+                docs[i] = future.result()
+
+    if cache:
+        log(f"Document cache: {cache.stats()}")
+    log("All files have been processed.")
+    return docs
+
+_default_index = None
+
+def get_default_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = BM25IndexStore()
+    return _default_index
+
+CONTEXT_PROMPT = """
+        Please provide most correct answer from the following context.
+        ---
+        Question: {question}
+        ---
+        Context: {Context}
+        """
+
+def build_context_chain(llm=None):
+    # Imported here so that importing RAG stays cheap at startup
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    if llm is None:
+        from langchain_upstage import ChatUpstage
+
+        llm = ChatUpstage(temperature=0)
+    prompt_template = PromptTemplate.from_template(CONTEXT_PROMPT)
+    return prompt_template | llm | StrOutputParser()
+
+def _build_inputs(docs, queries, index, context_budget, dense=None):
+    keys = []
+    inputs = []
+    query_vectors = dense.embed(queries) if dense is not None else None
+    for i, doc in enumerate(docs):
+        with tracer.span("rag.index", doc=i):
+            doc_index = index.get(doc)
+        for q, query in enumerate(queries):
+            with tracer.span("rag.retrieve", doc=i, hybrid=dense is not None) as span:
+                if dense is not None:
+                    context_docs = dense.hybrid_search(doc_index, doc, query, query_vector=query_vectors[q])
+                else:
+                    context_docs = doc_index["retriever"].invoke(query)
+                span.set(chunks=len(context_docs), context_chars=sum(len(d.page_content) for d in context_docs))
+            keys.append((i, query))
+            context = pack_documents(context_docs, query=query, budget=context_budget)
+            inputs.append({"question": query, "Context": context})
+    return keys, inputs
+
+def _collect_results(docs, keys, outputs, verbose=True):
+    log = print if verbose else _quiet
+    results = {i: {} for i in range(len(docs))}
+    for (i, query), context in zip(keys, outputs):
+        if isinstance(context, Exception):
+            tracer.incr("rag.summary_failures")
+            log(f"Document {i}, Query: {query} failed: {context!r}")
+            continue
+        results[i][query] = context
+        log(f"Document {i}, Query: {query}")
+        log(context)
+        log("---")
+    return results
+
+def process_documents(docs: List[List], queries: List[str], index: BM25IndexStore = None,
+                      llm=None, max_concurrency: int = 4,
+                      context_budget: int = CONTEXT_TOKEN_BUDGET, dense=None,
+                      verbose: bool = True) -> Dict[int, Dict[str, str]]:
+    """
+    Answers each query against each document with BM25 (or hybrid BM25 + dense)
+    retrieval and an LLM summary.
+
+    All (document, query) summaries are independent, so they are sent as one
+    chain.batch call with at most max_concurrency requests in flight. A failed
+    summary is reported and left out of the results instead of failing the
+    whole batch. Retrieved chunks are stripped of markup, deduplicated and
+    cut to context_budget tokens before they go into the prompt.
+
+    :param docs: List of document lists
+    :param queries: Queries to run against every document
+    :param index: BM25IndexStore holding prebuilt indexes (default: None, uses the shared default store)
+    :param llm: Chat model used for the summaries (default: None, uses ChatUpstage)
+    :param max_concurrency: Maximum number of LLM calls in flight
+    :param context_budget: Approximate token budget for each {Context} slot
+    :param dense: DenseIndexStore; when given, retrieval fuses BM25 and dense rankings
+    :param verbose: Print each summary as it is collected
+    :return: Dict mapping document position to {query: summary}
+    """
+    if index is None:
+        index = get_default_index()
+
+    chains = build_context_chain(llm)
+    keys, inputs = _build_inputs(docs, queries, index, context_budget, dense)
+    with tracer.span("rag.summaries", calls=len(inputs)):
+        outputs = chains.batch(
+            inputs, config=tracer.config(max_concurrency=max_concurrency), return_exceptions=True
+        )
+    return _collect_results(docs, keys, outputs, verbose)
+
+async def aprocess_documents(docs: List[List], queries: List[str], index: BM25IndexStore = None,
+                             llm=None, max_concurrency: int = 4,
+                             context_budget: int = CONTEXT_TOKEN_BUDGET, dense=None,
+                             verbose: bool = True) -> Dict[int, Dict[str, str]]:
+    """
+    Async version of process_documents, using chain.abatch.
+    """
+    if index is None:
+        index = get_default_index()
+
+    chains = build_context_chain(llm)
+    keys, inputs = _build_inputs(docs, queries, index, context_budget, dense)
+    with tracer.span("rag.summaries", calls=len(inputs)):
+        outputs = await chains.abatch(
+            inputs, config=tracer.config(max_concurrency=max_concurrency), return_exceptions=True
+        )
+    return _collect_results(docs, keys, outputs, verbose)
@@ -1,6 +1,19 @@
+import os
 import pandas as pd
 from datetime import datetime, timedelta
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from context_packing import SLOT_TOKEN_BUDGET, pack_summaries
+from digests import resolve_context
+from prefetch import join, prefetch_context, submit
+from score_store import ITEM_NAMES, NUM_ITEMS
+from streaming import print_stream_stats, stream_chain
+from tracing import tracer
+
+REHABILITATION_DOC_INDICES = [3, 5, 6, 7]
+REHABILITATION_QUERIES = ["upper extremity, complications"]
+SCORES_DIR = '/content/drive/MyDrive/240814_Llama_RAG'
 
 def calculate_7day_average(file_path, date=None):
     """
@@ -47,6 +60,21 @@ def input_item_scores():
     
     return scores
 
+def validate_item_scores(scores):
+    """
+    Checks a list of item scores supplied without the interactive prompt.
+
+    :param scores: List of 17 numeric item scores
+    :return: List of 17 floats
+    :raises ValueError: If the list has the wrong length or a non-numeric score
+    """
+    if not isinstance(scores, (list, tuple)) or len(scores) != NUM_ITEMS:
+        raise ValueError(f"Expected a list of {NUM_ITEMS} item scores")
+    try:
+        return [float(score) for score in scores]
+    except (TypeError, ValueError):
+        raise ValueError("Item scores must be numbers")
+
 def compare_scores(item_scores, average_scores):
     """
     Compare current scores with 7-day averages and identify items with decreased scores.
@@ -55,18 +83,11 @@ def compare_scores(item_scores, average_scores):
     :param average_scores: List of 7-day average scores for items 1-17
     :return: List of tuples containing (item name, current score, average score) for decreased items
     """
-    item_names = [
-        "Reach fwd", "Reach Up", "Reach Down", "Lift Up", "Push Down",
-        "Wrist Up", "Acquire - Release", "Grasp Dynamometer", "Lateral Pinch",
-        "Pull Weight", "Push Weight", "Container", "Pinch Die", "Pencil",
-        "Manipulate (chip)", "Push Index", "Push Thumb"
-    ]
-
     decreased_items = []
 
     for i, (current, average) in enumerate(zip(item_scores, average_scores)):
         if current < average:
-            decreased_items.append(item_names[i])
+            decreased_items.append(ITEM_NAMES[i])
 
     return decreased_items
 
@@ -85,7 +106,8 @@ def get_patient_info():
         new_symptoms
     ]
 
-def rehabilitation_evaluation(llm, docs, decreased_items, patient_info):
+def rehabilitation_evaluation(llm, docs, decreased_items, patient_info, stream=False, on_token=None,
+                              result_context=None, summary_budget=SLOT_TOKEN_BUDGET, dense=None):
     prompt_template = PromptTemplate.from_template(
         """
         You are a renowned rehabilitation medicine specialist. Evaluate physical functions related to patient's diagnosis and disabilities. Educate the patient with proper rehabilitation exercise with regards to functions declining over time. Check whether there are recently acquired symptoms and check whether those symptoms indicate complications related to patient's diagnosis.
@@ -163,34 +185,69 @@ def rehabilitation_evaluation(llm, docs, decreased_items, patient_info):
     )
     chain = prompt_template | llm | StrOutputParser()
 
-    docs_list = [docs[3], docs[5], docs[6], docs[7]]
-
     diagnosed_patient = patient_info[0]
-    queries = [f"upper extremity, complications"]
-    result_context = process_documents(docs_list, queries)
-
-    result = chain.invoke({
-        "CUE T Manual": result_context[0],
-        "PTX": result_context[1],
-        "Stroke Complications": result_context[2],
-        "SCI Complications": result_context[3],
+    # result_context may already have been prefetched while the patient was answering
+    if result_context is None:
+        docs_list = [docs[i] for i in REHABILITATION_DOC_INDICES]
+        with tracer.span("workflow.rehabilitation.context"):
+            result_context = resolve_context(docs_list, REHABILITATION_QUERIES, llm=llm, dense=dense)
+
+    inputs = {
+        "CUE T Manual": pack_summaries(result_context[0], summary_budget),
+        "PTX": pack_summaries(result_context[1], summary_budget),
+        "Stroke Complications": pack_summaries(result_context[2], summary_budget),
+        "SCI Complications": pack_summaries(result_context[3], summary_budget),
         "diagnosed patient": diagnosed_patient,
         "patient's disability": patient_info[0],
         "functional evaluation": patient_info[1],
         "ITEMs": decreased_items,
         "newly acquired symptoms": patient_info[2]
-    })
+    }
+
+    with tracer.span("workflow.rehabilitation.llm", decreased_items=len(decreased_items)) as span:
+        if stream:
+            result, stats = stream_chain(chain, inputs, on_token=on_token, config=tracer.config())
+            print_stream_stats(stats)
+            span.set(**stats)
+        else:
+            result = chain.invoke(inputs, tracer.config())
 
     return result
 
-def rehabilitation_assessment_workflow(llm, docs, file_path):
-    # Step 1: Calculate 7-day average
-    average_scores = calculate_7day_average(file_path)
-    print("7-day average scores calculated.")
+def stored_7day_average(store, patient_id, file_path, date=None):
+    """
+    Returns the 7-day average from a ScoreStore, importing the patient's CSV
+    history first if the store has no sessions for them yet.
+    """
+    if not store.has_patient(patient_id) and os.path.exists(file_path):
+        store.import_csv_if_absent(patient_id, file_path)
+    return store.seven_day_average(patient_id, date)
+
+def rehabilitation_assessment_workflow(llm, docs, file_path, store=None, stream=False, dense=None):
+    # Check for score history before the patient types anything
+    patient_id = os.path.splitext(os.path.basename(file_path))[0]
+    if not os.path.exists(file_path) and not (store is not None and store.has_patient(patient_id)):
+        print(f"No score history found for diagnostic assessment ID {patient_id!r} ({file_path}).")
+        return None
+
+    # The guideline context and the 7-day average do not depend on the answers,
+    # so both are computed in the background while the patient is typing
+    context_future = prefetch_context(llm, docs, REHABILITATION_DOC_INDICES, REHABILITATION_QUERIES, dense=dense)
+
+    # Step 1: Calculate 7-day average (from the score store when one is given,
+    # importing the patient's CSV on first use)
+    if store is not None:
+        average_future = submit("averages", stored_7day_average, store, patient_id, file_path)
+    else:
+        average_future = submit("averages", calculate_7day_average, file_path)
 
     # Step 2: Input current item scores
     print("\nPlease input the current scores for each item:")
     current_scores = input_item_scores()
+    average_scores = join("averages", average_future)
+    print("7-day average scores calculated.")
+    if store is not None:
+        store.append(patient_id, current_scores)
 
     # Step 3: Compare scores and identify decreased items
     decreased_items = compare_scores(current_scores, average_scores)
@@ -199,10 +256,18 @@ def rehabilitation_assessment_workflow(llm, docs, file_path):
     # Step 4: Get patient information
     print("\nPlease provide the following patient information:")
     patient_info = get_patient_info()
+    result_context = join("context", context_future)
 
-    result = rehabilitation_evaluation(llm, docs, decreased_items, patient_info)
+    if stream:
+        print("\nAssessment Result:")
+        result = rehabilitation_evaluation(llm, docs, decreased_items, patient_info, stream=True,
+                                           result_context=result_context)
+    else:
+        result = rehabilitation_evaluation(llm, docs, decreased_items, patient_info,
+                                           result_context=result_context)
 
-    print("\nAssessment Result:")
-    print(result)
+        print("\nAssessment Result:")
+        print(result)
 
     print("\nWorkflow completed.")
+    return result
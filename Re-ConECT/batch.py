@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from score_store import NUM_ITEMS, SCORE_DB_ENV
+
+WORKFLOWS = ("diagnosis", "assessment")
+_BOOLEAN_FIELDS = ("full_assessment", "record")
+
+
+def _from_csv_row(row):
+    """
+    Converts a flat CSV row into a service intake. Assessment rows carry
+    'Item 1'..'Item 17' columns and the patient_info fields as columns.
+    Boolean columns are parsed, so "false" is not a truthy string; values
+    that do not parse are left for the service to reject.
+    """
+    from service import PATIENT_INFO_FIELDS, parse_flag
+
+    intake = {key: value for key, value in row.items() if value not in (None, "")}
+    for key in _BOOLEAN_FIELDS:
+        if key in intake:
+            try:
+                intake[key] = parse_flag(intake[key])
+            except ValueError:
+                pass
+    if f"Item {NUM_ITEMS}" in intake:
+        intake["scores"] = [intake.pop(f"Item {i}", None) for i in range(1, NUM_ITEMS + 1)]
+        intake["patient_info"] = {field: intake.pop(field, "") for field in PATIENT_INFO_FIELDS}
+    return intake
+
+
+def read_intakes(path):
+    """
+    Streams intakes from a .jsonl file (one JSON object per line) or a .csv
+    file (one intake per row) without reading the whole file into memory.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield _from_csv_row(row)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def intake_id(intake):
+    """
+    Returns the intake's resume key: its own 'id', or "" if it has none. The
+    patient_id is deliberately not used, since one patient can have several
+    sessions in a file.
+    """
+    value = intake.get("id")
+    return "" if value is None else str(value).strip()
+
+
+def truncate_partial_line(output_path):
+    """
+    Cuts a line left incomplete by a crash off the end of the output file, so
+    the next record does not get glued onto it.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Scan back block by block to the last complete line
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def completed_ids(output_path):
+    """
+    Returns the ids that already have a successful result in the output file.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that intake is simply rerun
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+async def run_batch(service, input_path, output_path, workflow=None, max_in_flight=16):
+    """
+    Runs every intake in input_path through the service and appends one JSON
+    line per intake to output_path as soon as it finishes.
+
+    Every intake needs a unique 'id'. Intakes whose id already has an "ok"
+    line in output_path are skipped, so a crashed run can simply be started
+    again; a line the crash left incomplete is removed first. An intake
+    without an id, or repeating an id seen earlier in the input, gets an
+    error line instead of being run or silently skipped. Assessment sessions
+    are recorded under the intake id, so a rerun never records one twice.
+
+    At most max_in_flight intakes are read ahead and processed at once,
+    which keeps memory flat for any input size.
+
+    :param service: ReConECTService
+    :param input_path: .jsonl or .csv intake file
+    :param output_path: .jsonl results file (appended to)
+    :param workflow: "diagnosis" or "assessment"; per-intake "workflow" fields override it
+    :param max_in_flight: Maximum number of intakes being processed at once
+    :return: Dict with ok/error/skipped counts
+    """
+    truncate_partial_line(output_path)
+    done = completed_ids(output_path)
+    seen = set()
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def run_one(intake):
+            record = {"id": intake_id(intake), "workflow": intake.get("workflow", workflow)}
+            try:
+                if record["workflow"] not in WORKFLOWS:
+                    raise ValueError(f"unknown workflow {record['workflow']!r}")
+                if record["workflow"] == "diagnosis":
+                    result = await service.diagnose(intake)
+                else:
+                    result = await service.assess(intake)
+                record.update(status="ok", **result)
+                counts["ok"] += 1
+            except Exception as e:
+                record.update(status="error", error=str(e) or repr(e))
+                counts["error"] += 1
+            write(record)
+
+        for intake in read_intakes(input_path):
+            key = intake_id(intake)
+            if not key:
+                write({"id": None, "patient_id": intake.get("patient_id"), "status": "error",
+                       "error": "intake has no 'id'"})
+                counts["error"] += 1
+                continue
+            if key in seen:
+                write({"id": key, "status": "error", "error": f"duplicate id {key!r} in input"})
+                counts["error"] += 1
+                continue
+            seen.add(key)
+            if key in done:
+                counts["skipped"] += 1
+                continue
+
+            await slots.acquire()
+            task = asyncio.create_task(run_one(intake))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), slots.release()))
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    return counts
+
+
+if __name__ == "__main__":
+    from main import create_dense, create_llm
+    from RAG import load_documents
+    from response_cache import ResponseCache
+    from score_store import ScoreStore
+    from service import ReConECTService
+    from tracing import export_on_exit
+
+    parser = argparse.ArgumentParser(description="Run diagnosis/assessment workflows over an intake file.")
+    parser.add_argument("input", help=".jsonl or .csv intake file")
+    parser.add_argument("output", help=".jsonl results file; existing ok results are skipped")
+    parser.add_argument("--pdf-files", nargs="+", required=True, help="Corpus PDF files, in corpus order")
+    parser.add_argument("--workflow", choices=WORKFLOWS, help="Workflow for intakes without a 'workflow' field")
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads (concurrent LLM calls)")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--score-db", default=os.environ.get(SCORE_DB_ENV),
+                        help=f"ScoreStore database for assessments (default: ${SCORE_DB_ENV}, else per-ID CSVs)")
+    parser.add_argument("--llm", choices=["upstage", "local"], help="Chat model backend (default: RECONECT_LLM or upstage)")
+    parser.add_argument("--retrieval", choices=["bm25", "hybrid"],
+                        help="Retrieval mode (default: RECONECT_RETRIEVAL or bm25)")
+    args = parser.parse_args()
+    export_on_exit()
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.workers))
+        service = ReConECTService(
+            create_llm(args.llm),
+            load_documents(args.pdf_files),
+            store=ScoreStore(args.score_db) if args.score_db else None,
+            max_concurrency=args.workers,
+            response_cache=ResponseCache(),
+            dense=create_dense(args.retrieval),
+        )
+        counts = await run_batch(service, args.input, args.output, args.workflow, args.max_in_flight)
+        print(f"Batch finished: {counts}")
+
+    asyncio.run(main())
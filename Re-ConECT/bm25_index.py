@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+
+from document_cache import (
+    DEFAULT_CACHE_DIR,
+    atomic_write,
+    documents_hash,
+    dump_blob,
+    evict_lru,
+    load_blob,
+    options_digest,
+    touch,
+)
+from tracing import tracer
+
+SPLITTER_OPTIONS = {"chunk_size": 1000, "chunk_overlap": 100, "language": "html"}
+
+_MANIFEST = "manifest.json"
+_BLOB_SUFFIX = ".pkl.z"
+
+
+def build_index(doc, splitter_options=SPLITTER_OPTIONS):
+    """
+    Splits a document list into chunks and builds a BM25 retriever over them.
+
+    :return: Dict with the "chunks" list, the fitted "retriever" and the
+        "splitter_options" the chunks were made with
+    """
+    from langchain_community.retrievers import BM25Retriever
+    from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter.from_language(
+        chunk_size=splitter_options["chunk_size"],
+        chunk_overlap=splitter_options["chunk_overlap"],
+        language=Language(splitter_options["language"]),
+    )
+    splits = text_splitter.split_documents(doc)
+    return {
+        "chunks": splits,
+        "retriever": BM25Retriever.from_documents(splits),
+        "splitter_options": dict(splitter_options),
+    }
+
+
+class BM25IndexStore:
+    """
+    Build-once store of per-document BM25 indexes.
+
+    Each index holds the chunks and fitted BM25 statistics for one document
+    list and is keyed by the document's content hash plus the splitter
+    options, so an unchanged guideline is never split or re-indexed again.
+    Indexes are persisted to index_dir (None keeps them in memory only) and
+    loaded lazily on first use. Named entries let one guideline be replaced
+    or removed without touching the others.
+
+    Indexes reached only by content hash (the get() path used by
+    process_documents) are evicted least recently used once max_entries or
+    max_bytes is exceeded, so indexes of superseded guideline versions do not
+    pile up on disk. Named entries are never evicted.
+    """
+
+    def __init__(self, index_dir=os.path.join(DEFAULT_CACHE_DIR, "bm25"), splitter_options=SPLITTER_OPTIONS,
+                 max_entries=64, max_bytes=256 << 20):
+        self.index_dir = index_dir
+        self.splitter_options = splitter_options
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._indexes = {}
+        self._manifest = {}
+        self._lock = threading.Lock()
+        if index_dir is not None:
+            os.makedirs(index_dir, exist_ok=True)
+            try:
+                with open(os.path.join(index_dir, _MANIFEST), "r") as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+
+    def _key(self, doc):
+        return f"{documents_hash(doc)}-{options_digest(self.splitter_options)[:16]}"
+
+    def _path(self, key):
+        return os.path.join(self.index_dir, f"{key}{_BLOB_SUFFIX}")
+
+    def _write_manifest(self):
+        if self.index_dir is None:
+            return
+        atomic_write(os.path.join(self.index_dir, _MANIFEST), lambda f: json.dump(self._manifest, f), "w")
+
+    def _load(self, key, doc=None):
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is not None:
+            tracer.incr("bm25_index.hits")
+            return index
+
+        tracer.incr("bm25_index.misses")
+        if self.index_dir is not None and os.path.exists(self._path(key)):
+            with tracer.span("bm25_index.load"):
+                index = load_blob(self._path(key))
+            touch(self._path(key))
+        elif doc is not None:
+            with tracer.span("bm25_index.build") as span:
+                index = build_index(doc, self.splitter_options)
+                span.set(chunks=len(index["chunks"]))
+            if self.index_dir is not None:
+                dump_blob(index, self._path(key))
+                self._evict(keep=key)
+        else:
+            raise KeyError(key)
+
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def get(self, doc):
+        """
+        Returns the index for a document list, building it on first use.
+        """
+        return self._load(self._key(doc), doc)
+
+    def get_retriever(self, doc):
+        """
+        Returns the BM25 retriever for a document list, building it on first use.
+        """
+        return self.get(doc)["retriever"]
+
+    def add(self, name, doc):
+        """
+        Registers (or replaces) the index for a named guideline. Only this
+        document is split and indexed; the other entries are left untouched.
+        """
+        key = self._key(doc)
+        self._load(key, doc)
+        with self._lock:
+            old_key = self._manifest.get(name)
+            self._manifest[name] = key
+            self._write_manifest()
+        if old_key is not None and old_key != key:
+            self._discard(old_key)
+        return key
+
+    def remove(self, name):
+        """
+        Removes a named guideline's index.
+        """
+        with self._lock:
+            key = self._manifest.pop(name, None)
+            self._write_manifest()
+        if key is not None:
+            self._discard(key)
+
+    def retriever(self, name):
+        """
+        Returns the BM25 retriever for a named guideline, loading it lazily.
+        """
+        return self._load(self._manifest[name])["retriever"]
+
+    def names(self):
+        return list(self._manifest)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            protected = set(self._manifest.values())
+        protected.add(keep)
+        removed = evict_lru(self.index_dir, _BLOB_SUFFIX, self.max_entries, self.max_bytes, protected)
+        if removed:
+            tracer.incr("bm25_index.evictions", removed)
+
+    def _discard(self, key):
+        with self._lock:
+            if key in self._manifest.values():
+                return
+            self._indexes.pop(key, None)
+        if self.index_dir is not None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from score_store import ITEM_NAMES, NUM_ITEMS
+
+ITEM_COLUMNS = [f"Item {i}" for i in range(1, NUM_ITEMS + 1)]
+
+
+def cohort_window_averages(history, date=None, days=7):
+    """
+    Computes every patient's trailing-window item averages in one grouped pass.
+
+    :param history: DataFrame with 'patient_id', 'datetime' and 'Item 1'..'Item 17' columns
+    :param date: Reference date (default: None, uses today's date if None)
+    :param days: Window length in days
+    :return: DataFrame indexed by patient_id with one averaged column per item
+    """
+    if date is None:
+        date = datetime.now()
+    elif isinstance(date, str):
+        date = datetime.strptime(date, "%Y-%m-%d")
+
+    recent = history[history["datetime"] > date - timedelta(days=days)]
+    return recent.groupby("patient_id", sort=False)[ITEM_COLUMNS].mean().round(2)
+
+
+def cohort_decline_matrix(history, current, date=None, days=7):
+    """
+    Flags, for many patients at once, which items dropped below their
+    trailing-window average. This is the batch form of calculate_7day_average
+    followed by compare_scores.
+
+    :param history: DataFrame with 'patient_id', 'datetime' and 'Item 1'..'Item 17' columns
+    :param current: DataFrame indexed by patient_id with 'Item 1'..'Item 17' current scores
+    :param date: Reference date (default: None, uses today's date if None)
+    :param days: Window length in days
+    :return: Boolean DataFrame (patients x ITEM_NAMES); True where the score decreased
+    """
+    averages = cohort_window_averages(history, date, days).reindex(current.index)
+    # NaN averages compare False, as in compare_scores
+    declined = current[ITEM_COLUMNS].to_numpy() < averages.to_numpy()
+    return pd.DataFrame(declined, index=current.index, columns=ITEM_NAMES)
+
+
+def declining_patients(decline_matrix):
+    """
+    Returns {patient_id: [decreased item names]} for patients with any decline.
+    """
+    flagged = decline_matrix[decline_matrix.any(axis=1)]
+    return {
+        patient_id: [name for name, dropped in row.items() if dropped]
+        for patient_id, row in flagged.iterrows()
+    }
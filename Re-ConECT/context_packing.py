@@ -0,0 +1,167 @@
+import html
+import re
+
+CONTEXT_TOKEN_BUDGET = 1500
+SLOT_TOKEN_BUDGET = 600
+DUPLICATE_THRESHOLD = 0.8
+# Shortest run of characters treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+
+# Only real tags: "<20" or "> 50" in clinical text are not markup
+_TAG_RE = re.compile(r"</?[A-Za-z][^>]*>")
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)")
+
+
+def strip_html(text):
+    """
+    Removes markup left by the HTML layout loader and collapses whitespace.
+    """
+    text = _TAG_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", html.unescape(text)).strip()
+
+
+def count_tokens(text):
+    """
+    Approximates the token count of a text (about 4 characters per token).
+    """
+    return (len(text) + 3) // 4
+
+
+def _shingles(text, size=5):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap(a, b, min_chars=MIN_OVERLAP_CHARS):
+    """
+    Returns the length of the longest suffix of a that is also a prefix of b
+    (0 if it is shorter than min_chars).
+    """
+    if len(b) < min_chars:
+        return 0
+    head = b[:min_chars]
+    start = max(0, len(a) - len(b))
+    while True:
+        i = a.find(head, start)
+        if i == -1:
+            return 0
+        if b.startswith(a[i:]):
+            return len(a) - i
+        start = i + 1
+
+
+def trim_overlap(chunk, kept):
+    """
+    Removes the text a chunk shares with an already kept chunk at its start
+    or end, i.e. the chunk_overlap the splitter repeats between neighbouring
+    chunks (which may begin mid-word).
+    """
+    for other in kept:
+        shared = _overlap(other, chunk)
+        if shared:
+            chunk = chunk[shared:].lstrip()
+        shared = _overlap(chunk, other)
+        if shared:
+            chunk = chunk[:len(chunk) - shared].rstrip()
+    return chunk
+
+
+def dedupe_chunks(chunks, threshold=DUPLICATE_THRESHOLD):
+    """
+    Drops chunks whose word 5-grams are mostly contained in an earlier chunk
+    and trims the splitter overlap a chunk shares with an earlier one, so
+    no passage appears twice. Earlier (higher ranked) chunks are kept whole.
+    """
+    kept = []
+    kept_shingles = []
+    for chunk in chunks:
+        chunk = trim_overlap(chunk, kept)
+        if not chunk:
+            continue
+        shingles = _shingles(chunk)
+        duplicate = False
+        for other in kept_shingles:
+            overlap = len(shingles & other) / max(1, min(len(shingles), len(other)))
+            if overlap >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(chunk)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def rank_chunks(chunks, query=None):
+    """
+    Orders chunks by how many distinct query terms they contain, keeping the
+    incoming (retriever) order between ties.
+    """
+    if not query:
+        return list(chunks)
+    terms = set(_WORD_RE.findall(query.lower()))
+    scored = [(-len(terms & set(_WORD_RE.findall(chunk.lower()))), i, chunk) for i, chunk in enumerate(chunks)]
+    return [chunk for _, _, chunk in sorted(scored)]
+
+
+def truncate_to_budget(text, budget):
+    """
+    Cuts a text to about budget tokens at the last sentence end that fits,
+    or at the last word boundary if no sentence ends in the second half.
+    """
+    limit = budget * 4
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(head)]
+    if ends and ends[-1] >= limit // 2:
+        return head[:ends[-1]]
+    cut = head.rfind(" ")
+    return head[:cut] if cut > 0 else head
+
+
+def fit_to_budget(chunks, budget=CONTEXT_TOKEN_BUDGET, separator="\n---\n"):
+    """
+    Joins chunks in order until the token budget is used. The first chunk
+    that does not fit is cut at a sentence boundary to fill the remainder.
+    """
+    packed = []
+    used = 0
+    sep_tokens = count_tokens(separator)
+    for chunk in chunks:
+        sep = sep_tokens if packed else 0
+        tokens = count_tokens(chunk) + sep
+        if used + tokens > budget:
+            if budget - used - sep > 0:
+                head = truncate_to_budget(chunk, budget - used - sep)
+                if head:
+                    packed.append(head)
+            break
+        packed.append(chunk)
+        used += tokens
+    return separator.join(packed)
+
+
+def pack_documents(context_docs, query=None, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Turns retrieved Documents into a prompt-ready context string: markup is
+    stripped, near-duplicate chunks are dropped, the rest is ranked against
+    the query and cut to the token budget.
+    """
+    chunks = [strip_html(doc.page_content) for doc in context_docs]
+    chunks = dedupe_chunks([chunk for chunk in chunks if chunk])
+    return fit_to_budget(rank_chunks(chunks, query), budget)
+
+
+def pack_summaries(doc_results, budget=SLOT_TOKEN_BUDGET):
+    """
+    Formats one document's {query: summary} results for a prompt slot as
+    plain text instead of a dict repr, cut at a sentence boundary to the
+    slot's token budget. Summaries are model text, not loader HTML, so only
+    their whitespace is normalized.
+    """
+    chunks = [_SPACE_RE.sub(" ", str(summary)).strip() for summary in doc_results.values()]
+    return fit_to_budget(dedupe_chunks([chunk for chunk in chunks if chunk]), budget)
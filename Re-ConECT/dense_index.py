@@ -0,0 +1,150 @@
+import os
+import threading
+
+import numpy as np
+
+from document_cache import DEFAULT_CACHE_DIR, atomic_write, documents_hash, options_digest
+from tracing import tracer
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+RRF_K = 60
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Loads a sentence-transformers model on CPU, once per process.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "Dense retrieval needs sentence-transformers: pip install sentence-transformers"
+                )
+            _models[model_name] = SentenceTransformer(model_name, device="cpu")
+        return _models[model_name]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses several ranked lists of ids with reciprocal rank fusion.
+
+    :param rankings: Iterable of lists of ids, best first
+    :return: List of ids ordered by fused score
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda item: (-scores[item], item))
+
+
+class DenseIndexStore:
+    """
+    Per-document dense embedding indexes for hybrid BM25 + dense retrieval.
+
+    Chunk embeddings are computed once on CPU and saved as float32 .npy
+    files next to the BM25 indexes, keyed by document content hash, the
+    splitter options the BM25 index was built with, its chunk count and the
+    embedding model, so a matrix is never paired with another chunking. They are opened with
+    np.load(mmap_mode="r"), so every process on a host reads the same page
+    cache instead of holding its own copy. Search is an exact inner product
+    over normalized vectors, which is fast at guideline-corpus scale.
+    """
+
+    def __init__(self, index_dir=os.path.join(DEFAULT_CACHE_DIR, "dense"), model_name=DEFAULT_EMBEDDING_MODEL,
+                 embed=None):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self._embed = embed
+        self._matrices = {}
+        self._lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+
+    def embed(self, texts):
+        """
+        Returns L2-normalized float32 embeddings for a list of texts.
+        """
+        if self._embed is not None:
+            vectors = np.asarray(self._embed(texts), dtype=np.float32)
+        else:
+            model = load_embedding_model(self.model_name)
+            vectors = model.encode(texts, batch_size=32, convert_to_numpy=True).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _path(self, doc, chunks, splitter_options=None):
+        key = options_digest({
+            "splitter": splitter_options,
+            "chunks": len(chunks),
+            "model": self.model_name,
+        })[:16]
+        return os.path.join(self.index_dir, f"{documents_hash(doc)}-{key}.npy")
+
+    def matrix(self, doc, chunks, splitter_options=None):
+        """
+        Returns the memory-mapped embedding matrix for a document's chunks,
+        computing and saving it on first use.
+
+        :param splitter_options: Options the chunks were split with
+        """
+        path = self._path(doc, chunks, splitter_options)
+        with self._lock:
+            matrix = self._matrices.get(path)
+        if matrix is not None:
+            return matrix
+
+        if not os.path.exists(path):
+            with tracer.span("dense_index.build", chunks=len(chunks)):
+                vectors = self.embed([chunk.page_content for chunk in chunks])
+            atomic_write(path, lambda f: np.save(f, vectors))
+
+        matrix = np.load(path, mmap_mode="r")
+        with self._lock:
+            self._matrices[path] = matrix
+        return matrix
+
+    def search(self, matrix, query_vector, k):
+        """
+        Returns the positions of the k chunks closest to the query vector.
+        """
+        scores = np.asarray(matrix @ query_vector)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def hybrid_search(self, bm25_index, doc, query, k=4, candidates=20, query_vector=None):
+        """
+        Retrieves chunks by fusing BM25 and dense rankings with reciprocal rank fusion.
+
+        :param bm25_index: Index dict from BM25IndexStore.get(doc)
+        :param doc: The document list the index was built from
+        :param query: Query text
+        :param k: Number of chunks to return
+        :param candidates: Depth of each ranking before fusion
+        :param query_vector: Precomputed normalized query embedding
+        :return: List of chunk Documents, best first
+        """
+        chunks = bm25_index["chunks"]
+        if not chunks:
+            return []
+        retriever = bm25_index["retriever"]
+
+        bm25_scores = np.asarray(retriever.vectorizer.get_scores(retriever.preprocess_func(query)))
+        depth = min(candidates, len(chunks))
+        bm25_top = np.argpartition(-bm25_scores, depth - 1)[:depth]
+        bm25_ranking = bm25_top[np.argsort(-bm25_scores[bm25_top])].tolist()
+
+        if query_vector is None:
+            query_vector = self.embed([query])[0]
+        matrix = self.matrix(doc, chunks, bm25_index.get("splitter_options"))
+        dense_ranking = self.search(matrix, query_vector, depth)
+
+        fused = reciprocal_rank_fusion([bm25_ranking, dense_ranking])
+        return [chunks[i] for i in fused[:k]]
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+
+from bm25_index import SPLITTER_OPTIONS
+from context_packing import CONTEXT_TOKEN_BUDGET
+from document_cache import DEFAULT_CACHE_DIR, atomic_write, documents_hash, options_digest
+from RAG import CONTEXT_PROMPT, process_documents
+from tracing import tracer
+
+DIGEST_VERSION = 2
+DEFAULT_DIGEST_PATH = os.path.join(DEFAULT_CACHE_DIR, "knowledge_digest.json")
+
+
+def retrieval_identity(dense=None):
+    """
+    Returns the retrieval mode: "bm25", or "hybrid:<embedding model>" when a
+    DenseIndexStore is used.
+    """
+    if dense is None:
+        return "bm25"
+    return f"hybrid:{dense.model_name}"
+
+
+def prompt_hash(dense=None):
+    """
+    Returns a digest of everything besides the documents that shapes a context
+    summary: the summary prompt template, the chunking options, the context
+    budget and the retrieval mode.
+
+    :param dense: DenseIndexStore for hybrid retrieval, None for BM25 only
+    """
+    return options_digest({
+        "prompt": CONTEXT_PROMPT,
+        "splitter": SPLITTER_OPTIONS,
+        "context_budget": CONTEXT_TOKEN_BUDGET,
+        "retrieval": retrieval_identity(dense),
+    })
+
+
+def model_identity(llm):
+    """
+    Returns a string identifying the chat model (class, model name and
+    temperature) that produces a summary. Summaries from different models
+    are stored under different keys.
+    """
+    if llm is None:
+        return "default"
+    name = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    return f"{type(llm).__name__}:{name}:{getattr(llm, 'temperature', None)}"
+
+
+def corpus_hash(docs):
+    """
+    Returns a digest of a whole corpus (list of document lists).
+    """
+    return options_digest([documents_hash(doc) for doc in docs])
+
+
+class KnowledgeDigest:
+    """
+    Precomputed context summaries for the workflows' fixed queries.
+
+    Summaries are keyed by the model that wrote them, then by document
+    content hash and query, so an edited guideline simply misses while the
+    rest of the artifact stays valid, and a workflow running another model
+    never serves summaries it did not produce. The whole artifact is discarded
+    when its version or prompt hash (which includes the retrieval mode) no
+    longer matches the running code.
+    """
+
+    def __init__(self, entries=None, corpus=None, dense=None):
+        self.entries = entries if entries is not None else {}
+        self.corpus = corpus
+        self.dense = dense
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path=DEFAULT_DIGEST_PATH, dense=None):
+        """
+        Loads a digest artifact, returning an empty digest if it is missing or
+        stale, or was compiled with another retrieval mode.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(dense=dense)
+
+        if data.get("version") != DIGEST_VERSION or data.get("prompt_hash") != prompt_hash(dense):
+            print(f"Knowledge digest at {path} is stale and will be ignored.")
+            return cls(dense=dense)
+        return cls(data.get("entries", {}), data.get("corpus_hash"), dense)
+
+    def save(self, path=DEFAULT_DIGEST_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = {
+            "version": DIGEST_VERSION,
+            "prompt_hash": prompt_hash(self.dense),
+            "corpus_hash": self.corpus,
+            "entries": self.entries,
+        }
+        atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=1), "w", encoding="utf-8")
+
+    def add(self, doc, results, llm=None):
+        model_entries = self.entries.setdefault(model_identity(llm), {})
+        model_entries.setdefault(documents_hash(doc), {}).update(results)
+
+    def lookup(self, docs_list, queries, llm=None, index=None, verbose=True):
+        """
+        Returns context summaries in the same shape as process_documents.
+        Documents with any missing query fall back to live RAG, retrieving
+        the way the digest was compiled (hybrid when it has a dense store).
+
+        :param docs_list: List of document lists
+        :param queries: Queries to answer for every document
+        :param llm: Chat model used on a miss
+        :param index: BM25IndexStore used on a miss
+        :param verbose: Print live summaries as they are collected
+        :return: Dict mapping document position to {query: summary}
+        """
+        results = {}
+        missing = []
+        model_entries = self.entries.get(model_identity(llm), {})
+        for i, doc in enumerate(docs_list):
+            cached = model_entries.get(documents_hash(doc), {})
+            if all(query in cached for query in queries):
+                results[i] = {query: cached[query] for query in queries}
+                self.hits += 1
+                tracer.incr("digest.hits")
+            else:
+                missing.append(i)
+                self.misses += 1
+                tracer.incr("digest.misses")
+
+        if missing:
+            live = process_documents([docs_list[i] for i in missing], queries, index=index, llm=llm,
+                                     dense=self.dense, verbose=verbose)
+            for j, i in enumerate(missing):
+                results[i] = live[j]
+                self.add(docs_list[i], live[j], llm)
+        return results
+
+
+_default_digests = {}
+
+def get_default_digest(dense=None):
+    """
+    Returns the process-wide digest for a retrieval mode, loading it on first use.
+    """
+    mode = retrieval_identity(dense)
+    if mode not in _default_digests:
+        _default_digests[mode] = KnowledgeDigest.load(dense=dense)
+    return _default_digests[mode]
+
+
+def resolve_context(docs_list, queries, llm=None, digest=None, index=None, dense=None, verbose=True):
+    """
+    Returns context summaries from the knowledge digest, using live RAG only on a miss.
+
+    :param dense: DenseIndexStore for hybrid retrieval, None for BM25 only
+    """
+    if digest is None:
+        digest = get_default_digest(dense)
+    return digest.lookup(docs_list, queries, llm=llm, index=index, verbose=verbose)
+
+
+def compile_digests(docs, path=DEFAULT_DIGEST_PATH, llm=None, index=None, dense=None):
+    """
+    Precomputes the context summaries of every workflow's fixed queries and
+    writes them to a digest artifact.
+
+    :param docs: Full corpus as returned by load_documents
+    :param path: Output artifact path
+    :param llm: Chat model used for the summaries (default: main.create_llm(), the
+        model the workflows run with)
+    :param dense: DenseIndexStore to compile with hybrid retrieval, None for BM25 only
+    :return: The compiled KnowledgeDigest
+    """
+    from Diagnosis_process import DIAGNOSIS_DOC_INDICES, DIAGNOSIS_QUERIES
+    from Rehabilitation_assessment import REHABILITATION_DOC_INDICES, REHABILITATION_QUERIES
+
+    workflows = [
+        (REHABILITATION_DOC_INDICES, REHABILITATION_QUERIES),
+        (DIAGNOSIS_DOC_INDICES, DIAGNOSIS_QUERIES),
+    ]
+
+    if llm is None:
+        from main import create_llm
+
+        llm = create_llm()
+
+    digest = KnowledgeDigest(corpus=corpus_hash(docs), dense=dense)
+    for indices, queries in workflows:
+        docs_list = [docs[i] for i in indices]
+        results = process_documents(docs_list, queries, index=index, llm=llm, dense=dense)
+        for j, doc in enumerate(docs_list):
+            digest.add(doc, results[j], llm)
+
+    digest.save(path)
+    print(f"Knowledge digest written to {path}")
+    return digest
+
+
+if __name__ == "__main__":
+    from RAG import load_documents
+
+    parser = argparse.ArgumentParser(description="Precompute context summaries for the fixed workflow queries.")
+    parser.add_argument("pdf_files", nargs="+", help="Corpus PDF files, in corpus order")
+    parser.add_argument("--out", default=DEFAULT_DIGEST_PATH, help="Digest artifact path")
+    parser.add_argument("--llm", choices=["upstage", "local"], help="Chat model backend (default: RECONECT_LLM or upstage)")
+    parser.add_argument("--retrieval", choices=["bm25", "hybrid"],
+                        help="Retrieval mode (default: RECONECT_RETRIEVAL or bm25)")
+    args = parser.parse_args()
+
+    from main import create_dense, create_llm
+
+    compile_digests(load_documents(args.pdf_files), args.out, llm=create_llm(args.llm),
+                    dense=create_dense(args.retrieval))
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import threading
+import zlib
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "RECONECT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "re-conect")
+)
+
+_BLOB_SUFFIX = ".pkl.z"
+_DIGEST_INDEX = "digests.json"
+
+
+def atomic_write(path, write, mode="wb", **open_kwargs):
+    """
+    Writes a file next to its destination and renames it into place, so
+    readers never see a partial file.
+
+    :param path: Destination file path
+    :param write: Callable that writes the contents to the open file object
+    :param mode: File mode ("wb" or "w")
+    :param open_kwargs: Extra arguments for open(), e.g. encoding
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, **open_kwargs) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def touch(path):
+    """
+    Marks a cache file as recently used for evict_lru.
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, suffix, max_entries, max_bytes, protected=()):
+    """
+    Removes the least recently used files (oldest mtime first) ending in suffix
+    from directory until at most max_entries of them and max_bytes remain.
+    Files whose name without the suffix is in protected count towards the
+    limits but are never removed.
+
+    :return: Number of files removed
+    """
+    entries = []
+    count = 0
+    total_bytes = 0
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        count += 1
+        total_bytes += st.st_size
+        if name[:-len(suffix)] not in protected:
+            entries.append((st.st_mtime_ns, st.st_size, path))
+
+    entries.sort()
+    removed = 0
+    while entries and (count > max_entries or total_bytes > max_bytes):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        count -= 1
+        total_bytes -= size
+        removed += 1
+    return removed
+
+
+def dump_blob(obj, path, level=6):
+    """
+    Pickles and zlib-compresses an object to disk. The file is written next to
+    its destination and renamed into place so readers never see a partial blob.
+
+    :param obj: Any picklable object
+    :param path: Destination file path
+    :param level: zlib compression level
+    :return: Number of bytes written
+    """
+    data = zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), level)
+    atomic_write(path, lambda f: f.write(data))
+    return len(data)
+
+
+def load_blob(path):
+    """
+    Reads a blob written by dump_blob. The file is memory-mapped so the
+    decompressor reads straight from the page cache.
+
+    :param path: Blob file path
+    :return: The unpickled object
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return pickle.loads(zlib.decompress(mm))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def documents_hash(doc):
+    """
+    Returns a SHA-256 hex digest of a parsed document list's text and metadata.
+    """
+    h = hashlib.sha256()
+    for page in doc:
+        h.update(page.page_content.encode("utf-8"))
+        h.update(json.dumps(page.metadata, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def options_digest(options):
+    """
+    Returns a stable digest for a dict of loader options.
+    """
+    payload = json.dumps(options, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class DocumentCache:
+    """
+    Persistent cache of parsed documents keyed by file content hash plus the
+    loader options used to parse them.
+
+    Entries are stored as compressed pickles in cache_dir. Least recently used
+    entries are evicted once max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=256, max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._digests = self._read_digest_index()
+
+    def _read_digest_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, _DIGEST_INDEX), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_digest_index(self):
+        atomic_write(os.path.join(self.cache_dir, _DIGEST_INDEX), lambda f: json.dump(self._digests, f), "w")
+
+    def digest(self, pdf_file):
+        """
+        Returns the content digest of a file. Digests are remembered by path,
+        size and mtime so unchanged files are not re-hashed on every start.
+        """
+        path = os.path.abspath(pdf_file)
+        st = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = [st.st_size, st.st_mtime_ns, digest]
+            self._write_digest_index()
+        return digest
+
+    def _entry_path(self, pdf_file, options):
+        name = f"{self.digest(pdf_file)}-{options_digest(options)[:16]}{_BLOB_SUFFIX}"
+        return os.path.join(self.cache_dir, name)
+
+    def get(self, pdf_file, options):
+        """
+        Returns the cached documents for a file, or None on a miss.
+
+        :param pdf_file: Path to the source file
+        :param options: Loader options the documents were parsed with
+        """
+        path = self._entry_path(pdf_file, options)
+        try:
+            docs = load_blob(path)
+        except (OSError, ValueError, EOFError, zlib.error, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        touch(path)
+        with self._lock:
+            self.hits += 1
+        return docs
+
+    def put(self, pdf_file, options, docs):
+        """
+        Stores parsed documents for a file and evicts old entries if needed.
+        """
+        dump_blob(docs, self._entry_path(pdf_file, options))
+        self._evict()
+
+    def invalidate(self, pdf_file):
+        """
+        Removes every cached entry for the current contents of a file.
+
+        :return: Number of entries removed
+        """
+        prefix = self.digest(pdf_file)
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(_BLOB_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Removes all cached entries and forgets remembered digests.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_BLOB_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+        with self._lock:
+            self._digests = {}
+            self._write_digest_index()
+
+    def _evict(self):
+        removed = evict_lru(self.cache_dir, _BLOB_SUFFIX, self.max_entries, self.max_bytes)
+        with self._lock:
+            self.evictions += removed
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters and the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,95 @@
+import glob
+import os
+import threading
+
+from RAG import load_documents
+
+
+class DocumentRegistry:
+    """
+    Lazily loaded corpus, indexable by position (docs[3]) or by file stem
+    (docs["CUE_T_Manual"]).
+
+    Nothing is parsed when the registry is created; each document is loaded
+    through load_documents (and its persistent cache) the first time it is
+    accessed, so a workflow branch only pays for the documents it uses. A
+    document that is already being loaded (e.g. by a background preload) is
+    waited for rather than loaded a second time.
+    """
+
+    def __init__(self, pdf_files, **load_kwargs):
+        """
+        :param pdf_files: Directory containing the corpus PDFs (sorted by name), or a list of PDF paths
+        :param load_kwargs: Extra keyword arguments passed to load_documents
+        """
+        if isinstance(pdf_files, str):
+            pdf_files = sorted(glob.glob(os.path.join(pdf_files, "*.pdf")))
+        self.pdf_files = list(pdf_files)
+        self.names = [os.path.splitext(os.path.basename(path))[0] for path in self.pdf_files]
+        self.load_kwargs = load_kwargs
+        self._docs = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pdf_files)
+
+    def _position(self, key):
+        if isinstance(key, int):
+            if not -len(self) <= key < len(self):
+                raise IndexError(f"document index {key} out of range")
+            return key % len(self)
+        try:
+            return self.names.index(key)
+        except ValueError:
+            raise KeyError(key)
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        with self._lock:
+            doc = self._docs.get(position)
+        if doc is None:
+            self.preload([position])
+            with self._lock:
+                doc = self._docs.get(position)
+            if doc is None:
+                # The load this call waited for failed; try once more here
+                self.preload([position])
+                doc = self._docs[position]
+        return doc
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def is_loaded(self, key):
+        return self._position(key) in self._docs
+
+    def preload(self, keys, **load_kwargs):
+        """
+        Loads several documents in one load_documents call (in parallel when
+        max_workers is set in load_kwargs). Already loaded documents are skipped,
+        and documents another thread is loading are waited for.
+        Keyword arguments override the registry's load_kwargs for this call.
+        """
+        positions = list(dict.fromkeys(self._position(key) for key in keys))
+        done = threading.Event()
+        with self._lock:
+            pending = {self._loading[p] for p in positions if p in self._loading}
+            missing = [p for p in positions if p not in self._docs and p not in self._loading]
+            for position in missing:
+                self._loading[position] = done
+
+        if missing:
+            try:
+                loaded = load_documents([self.pdf_files[p] for p in missing], **{**self.load_kwargs, **load_kwargs})
+                with self._lock:
+                    for position, doc in zip(missing, loaded):
+                        self._docs.setdefault(position, doc)
+            finally:
+                with self._lock:
+                    for position in missing:
+                        self._loading.pop(position, None)
+                done.set()
+        for event in pending:
+            event.wait()
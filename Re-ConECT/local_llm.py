@@ -0,0 +1,426 @@
+import inspect
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from tracing import tracer
+
+DEFAULT_LOCAL_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+MAX_BATCH_SIZE = 8
+MAX_WAIT_SECONDS = 0.01
+MAX_NEW_TOKENS = 512
+# Prefixes are cached at this token granularity and only from this length on
+PREFIX_BLOCK = 16
+MIN_PREFIX_TOKENS = 64
+
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+_models = {}
+_engines = {}
+_models_lock = threading.Lock()
+
+
+def load_local_model(model_id=DEFAULT_LOCAL_MODEL, quantize_8bit=False):
+    """
+    Loads a causal LM and its tokenizer with transformers, once per process.
+    Uses float16 across the available GPUs when CUDA is present, float32 on
+    CPU otherwise. HF_TOKEN is read from the environment for gated models.
+
+    :param model_id: Hugging Face model id or local directory
+    :param quantize_8bit: Load the weights in 8 bit (needs bitsandbytes and a GPU)
+    :return: (tokenizer, model)
+    """
+    key = (model_id, quantize_8bit)
+    with _models_lock:
+        if key not in _models:
+            try:
+                import torch
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+            except ImportError:
+                raise ImportError("The local backend needs torch and transformers: pip install torch transformers")
+
+            token = os.environ.get("HF_TOKEN")
+            options = {"token": token}
+            if torch.cuda.is_available():
+                options.update(device_map="auto", torch_dtype=torch.float16)
+                if quantize_8bit:
+                    from transformers import BitsAndBytesConfig
+
+                    options["quantization_config"] = BitsAndBytesConfig(load_in_8bit=True)
+            tokenizer = AutoTokenizer.from_pretrained(model_id, token=token)
+            model = AutoModelForCausalLM.from_pretrained(model_id, **options).eval()
+            _models[key] = (tokenizer, model)
+        return _models[key]
+
+
+def get_engine(model_id=DEFAULT_LOCAL_MODEL, **options):
+    """
+    Returns the process-wide InferenceEngine for a model, creating it (and
+    loading the model) on first use, so every chain and worker thread shares
+    one copy of the weights and one request queue.
+    """
+    with _models_lock:
+        engine = _engines.get(model_id)
+    if engine is None:
+        tokenizer, model = load_local_model(model_id, options.pop("quantize_8bit", False))
+        with _models_lock:
+            engine = _engines.setdefault(model_id, InferenceEngine(tokenizer, model, **options))
+    return engine
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class _Request:
+    def __init__(self, ids, max_new_tokens, on_token):
+        self.ids = ids
+        self.max_new_tokens = max_new_tokens
+        self.on_token = on_token
+        self.future = Future()
+        self.text = ""
+
+
+class InferenceEngine:
+    """
+    Serves one local causal LM to any number of threads.
+
+    Requests are queued and a single worker thread runs them in dynamic
+    micro-batches: it takes the first waiting request, waits up to max_wait
+    seconds for more, and decodes up to max_batch_size prompts together
+    (greedy, left-padded). Concurrent chain calls therefore share forward
+    passes instead of running one prompt at a time.
+
+    Prompt prefixes that recur across requests (the chat header, a system
+    prompt, a template's static instructions) are detected by comparing each
+    prompt with recent ones. Their key/value cache is computed once and kept
+    in a small LRU, and later prompts starting with the same tokens only
+    prefill their remaining tokens.
+    """
+
+    def __init__(self, tokenizer, model, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_SECONDS,
+                 max_new_tokens=MAX_NEW_TOKENS, max_prefixes=4, min_prefix_tokens=MIN_PREFIX_TOKENS):
+        """
+        :param tokenizer: transformers tokenizer
+        :param model: transformers causal LM (e.g. from load_local_model)
+        :param max_batch_size: Maximum number of prompts decoded together
+        :param max_wait: Seconds to wait for more requests before starting a batch
+        :param max_new_tokens: Default generation limit per request
+        :param max_prefixes: Number of cached prompt prefixes (0 disables prefix caching)
+        :param min_prefix_tokens: Shortest shared prefix worth caching
+        """
+        import torch
+
+        self._torch = torch
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self.max_prefixes = max_prefixes
+        self.min_prefix_tokens = min_prefix_tokens
+
+        eos = getattr(model.generation_config, "eos_token_id", None)
+        eos = eos if isinstance(eos, (list, tuple)) else [eos]
+        self.eos_ids = {token for token in [*eos, tokenizer.eos_token_id] if token is not None}
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else min(self.eos_ids, default=0)
+
+        params = inspect.signature(model.forward).parameters
+        self._logits_arg = next((name for name in ("logits_to_keep", "num_logits_to_keep") if name in params), None)
+        try:
+            from transformers.cache_utils import DynamicCache
+
+            self._cache_cls = DynamicCache if hasattr(DynamicCache, "from_legacy_cache") else None
+        except ImportError:
+            self._cache_cls = None
+
+        self._prefixes = OrderedDict()
+        self._recent = deque(maxlen=max(2 * max_prefixes, 1))
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "batches": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                       "completion_tokens": 0}
+
+    def submit(self, prompt, max_new_tokens=None, on_token=None):
+        """
+        Queues a prompt and returns a Future resolving to a dict with "text",
+        "prompt_tokens", "completion_tokens" and "cached_tokens".
+
+        :param prompt: Prompt text, or token ids (e.g. from apply_chat_template)
+        :param max_new_tokens: Generation limit (default: the engine's)
+        :param on_token: Called from the worker thread with each new piece of text
+        """
+        ids = self.tokenizer(prompt)["input_ids"] if isinstance(prompt, str) else list(prompt)
+        request = _Request(ids, max_new_tokens or self.max_new_tokens, on_token)
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="local-llm", daemon=True)
+                self._worker.start()
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, prompt, max_new_tokens=None, on_token=None):
+        return self.submit(prompt, max_new_tokens, on_token).result()["text"]
+
+    def close(self):
+        """
+        Stops the worker thread after the queued requests have been served.
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def stats(self):
+        counts = dict(self.counts)
+        counts["mean_batch_size"] = counts["requests"] / counts["batches"] if counts["batches"] else 0.0
+        counts["cached_prefixes"] = len(self._prefixes)
+        return counts
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            try:
+                self._serve(batch)
+            except Exception as e:
+                # The single worker thread must outlive any failed batch
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _serve(self, batch):
+        # Requests sharing a header are batched under the shortest prefix
+        # they have in common. The caches are held by reference, so a later
+        # request evicting one from the LRU does not affect its group.
+        prefixes = {}
+        for request in batch:
+            try:
+                prefix, past = self._prefix_for(request.ids)
+            except Exception:
+                # e.g. out of memory: fall back to prefilling the whole prompt
+                tracer.incr("local_llm.prefix_errors")
+                prefix, past = (), None
+            prefixes[prefix] = past
+        groups = OrderedDict()
+        for request in batch:
+            prefix = min((p for p in prefixes if tuple(request.ids[:len(p)]) == p), key=len)
+            groups.setdefault(prefix, (prefixes[prefix], []))[1].append(request)
+        for prefix, (past, requests) in groups.items():
+            try:
+                self._generate(requests, prefix, past)
+            except Exception as e:
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _forward(self, **inputs):
+        if self._logits_arg is not None:
+            inputs[self._logits_arg] = 1
+        return self.model(use_cache=True, **inputs)
+
+    def _prefix_for(self, ids):
+        """
+        Returns the longest cached prefix of ids (as a tuple) and its cache,
+        caching a new one first if ids share a prefix at least
+        min_prefix_tokens longer with a recent prompt.
+        """
+        if self.max_prefixes <= 0:
+            return (), None
+        # A prompt needs at least one token of its own to prefill
+        best = max((p for p in self._prefixes if len(p) < len(ids) and tuple(ids[:len(p)]) == p),
+                   key=len, default=())
+
+        shared = max((_common_prefix(ids, other) for other in self._recent), default=0)
+        shared = min(shared, len(ids) - 1) // PREFIX_BLOCK * PREFIX_BLOCK
+        self._recent.append(ids)
+        if shared - len(best) >= self.min_prefix_tokens:
+            best = tuple(ids[:shared])
+            with tracer.span("local_llm.prefix", tokens=shared), self._torch.inference_mode():
+                past = self._forward(input_ids=self._torch.tensor([best], device=self.model.device)).past_key_values
+            self._prefixes[best] = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+            while len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)
+
+        if not best:
+            tracer.incr("local_llm.prefix.misses")
+            return (), None
+        self._prefixes.move_to_end(best)
+        tracer.incr("local_llm.prefix.hits")
+        return best, self._prefixes[best]
+
+    def _expand(self, past, batch_size):
+        # expand() makes no copy; the cache concatenates new positions into
+        # fresh tensors, so the stored prefix is never written to
+        layers = tuple((k.expand(batch_size, -1, -1, -1), v.expand(batch_size, -1, -1, -1)) for k, v in past)
+        return self._cache_cls.from_legacy_cache(layers) if self._cache_cls is not None else layers
+
+    def _emit(self, request, generated):
+        if request.on_token is None:
+            return
+        text = self.tokenizer.decode(generated, skip_special_tokens=True)
+        # Hold back an incomplete multi-byte character until the next token
+        if text.endswith("�"):
+            return
+        delta, request.text = text[len(request.text):], text
+        if delta:
+            request.on_token(delta)
+
+    def _generate(self, requests, prefix, prefix_past):
+        torch = self._torch
+        device = self.model.device
+        size = len(requests)
+        offset = len(prefix)
+        suffixes = [r.ids[offset:] for r in requests]
+        width = max(len(s) for s in suffixes)
+
+        input_ids = torch.full((size, width), self.pad_id, dtype=torch.long)
+        suffix_mask = torch.zeros((size, width), dtype=torch.long)
+        for row, suffix in enumerate(suffixes):
+            input_ids[row, width - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+            suffix_mask[row, width - len(suffix):] = 1
+        attention_mask = torch.cat([torch.ones((size, offset), dtype=torch.long), suffix_mask], dim=1).to(device)
+        position_ids = (offset + (suffix_mask.cumsum(-1) - 1).clamp(min=0)).to(device)
+        if prefix:
+            past = self._expand(prefix_past, size)
+        else:
+            past = self._cache_cls() if self._cache_cls is not None else None
+
+        generated = [[] for _ in requests]
+        finished = [False] * size
+        with tracer.span("local_llm.batch", size=size, prefix_tokens=offset, prefill_tokens=width), \
+                torch.inference_mode():
+            out = self._forward(input_ids=input_ids.to(device), attention_mask=attention_mask,
+                                position_ids=position_ids, past_key_values=past)
+            for _ in range(max(r.max_new_tokens for r in requests)):
+                next_tokens = out.logits[:, -1, :].argmax(dim=-1).tolist()
+                for row, token in enumerate(next_tokens):
+                    if finished[row]:
+                        continue
+                    if token in self.eos_ids:
+                        finished[row] = True
+                        continue
+                    generated[row].append(token)
+                    self._emit(requests[row], generated[row])
+                    finished[row] = len(generated[row]) >= requests[row].max_new_tokens
+                if all(finished):
+                    break
+                feed = [[self.pad_id if finished[row] else token] for row, token in enumerate(next_tokens)]
+                attention_mask = torch.cat([attention_mask, attention_mask.new_ones((size, 1))], dim=1)
+                position_ids = position_ids[:, -1:] + 1
+                out = self._forward(input_ids=torch.tensor(feed, device=device), attention_mask=attention_mask,
+                                    position_ids=position_ids, past_key_values=out.past_key_values)
+
+        for request, tokens in zip(requests, generated):
+            completion = len(tokens)
+            request.future.set_result({
+                "text": self.tokenizer.decode(tokens, skip_special_tokens=True),
+                "prompt_tokens": len(request.ids),
+                "completion_tokens": completion,
+                "cached_tokens": offset,
+            })
+            self.counts["prompt_tokens"] += len(request.ids)
+            self.counts["cached_tokens"] += offset
+            self.counts["completion_tokens"] += completion
+        self.counts["requests"] += size
+        self.counts["batches"] += 1
+        tracer.incr("local_llm.completion_tokens", sum(len(tokens) for tokens in generated))
+
+
+def _truncate_at_stop(text, stop):
+    for token in stop or []:
+        index = text.find(token)
+        if index != -1:
+            text = text[:index]
+    return text
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    LangChain chat model backed by the shared local InferenceEngine, usable in
+    the workflow chains in place of ChatUpstage. Decoding is greedy, like the
+    original Llama pipeline (do_sample=False).
+    """
+
+    model_name: str = DEFAULT_LOCAL_MODEL
+    max_new_tokens: int = MAX_NEW_TOKENS
+    system_prompt: Optional[str] = None
+    engine: Any = None
+
+    @property
+    def _llm_type(self):
+        return "local-transformers"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, "max_new_tokens": self.max_new_tokens}
+
+    def _engine(self):
+        if self.engine is None:
+            self.engine = get_engine(self.model_name)
+        return self.engine
+
+    def _prompt(self, messages):
+        tokenizer = self._engine().tokenizer
+        conversation = [{"role": _ROLES.get(m.type, "user"), "content": str(m.content)} for m in messages]
+        if self.system_prompt and not any(turn["role"] == "system" for turn in conversation):
+            conversation.insert(0, {"role": "system", "content": self.system_prompt})
+        if getattr(tokenizer, "chat_template", None):
+            return tokenizer.apply_chat_template(conversation, add_generation_prompt=True)
+        return "\n\n".join(turn["content"] for turn in conversation) + "\n\n"
+
+    def _message(self, output, stop, cls=AIMessage):
+        usage = {
+            "input_tokens": output["prompt_tokens"],
+            "output_tokens": output["completion_tokens"],
+            "total_tokens": output["prompt_tokens"] + output["completion_tokens"],
+        }
+        return cls(content=_truncate_at_stop(output["text"], stop), usage_metadata=usage,
+                   response_metadata={"cached_tokens": output["cached_tokens"]})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        output = self._engine().submit(self._prompt(messages), self.max_new_tokens).result()
+        return ChatResult(generations=[ChatGeneration(message=self._message(output, stop))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        pieces = queue.Queue()
+        future = self._engine().submit(self._prompt(messages), self.max_new_tokens, on_token=pieces.put)
+        future.add_done_callback(lambda f: pieces.put(None))
+        while True:
+            piece = pieces.get()
+            if piece is None:
+                break
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        # Surface engine errors and report usage on a final empty chunk
+        yield ChatGenerationChunk(message=self._message({**future.result(), "text": ""}, stop, AIMessageChunk))
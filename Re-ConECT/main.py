@@ -1,23 +1,79 @@
-from Diagnosis_process import Diagnosis_Process
-from Rehabilitation_assessment import rehabilitation_assessment_workflow
-from RAG import load_documents
-from langchain_upstage import ChatUpstage
+import os
 
-def check_diagnosis(llm, docs):
+from document_registry import DocumentRegistry
+
+# Workflow modules (and through them langchain_upstage, langchain_community and
+# pandas) are imported inside the branch that needs them, so the first prompt
+# appears without waiting for the heavy imports or the corpus. The documents a
+# workflow needs are loaded in the background while the patient answers.
+
+def create_llm(backend=None):
+    """
+    Creates the chat model for the workflows: ChatUpstage by default, or the
+    shared local transformers engine when backend (or RECONECT_LLM) is
+    "local". The local model is RECONECT_LOCAL_MODEL, defaulting to
+    Meta-Llama-3-8B-Instruct.
+    """
+    backend = backend or os.environ.get("RECONECT_LLM", "upstage")
+    if backend == "local":
+        from local_llm import DEFAULT_LOCAL_MODEL, LocalChatModel
+
+        return LocalChatModel(model_name=os.environ.get("RECONECT_LOCAL_MODEL", DEFAULT_LOCAL_MODEL))
+    if backend != "upstage":
+        raise ValueError(f"unknown LLM backend {backend!r}")
+
+    from langchain_upstage import ChatUpstage
+
+    return ChatUpstage(temperature=0)
+
+def create_store():
+    """
+    Returns the ScoreStore named by RECONECT_SCORE_DB, or None to read the
+    per-ID CSV files directly.
+    """
+    from score_store import SCORE_DB_ENV, ScoreStore
+
+    db_path = os.environ.get(SCORE_DB_ENV)
+    return ScoreStore(db_path) if db_path else None
+
+def create_dense(mode=None):
+    """
+    Returns the DenseIndexStore for hybrid BM25 + dense retrieval when mode
+    (or RECONECT_RETRIEVAL) is "hybrid", or None for BM25 only.
+    """
+    mode = mode or os.environ.get("RECONECT_RETRIEVAL", "bm25")
+    if mode == "hybrid":
+        from dense_index import DenseIndexStore
+
+        return DenseIndexStore()
+    if mode != "bm25":
+        raise ValueError(f"unknown retrieval mode {mode!r}")
+    return None
+
+def check_diagnosis(docs, stream=False, llm_factory=create_llm, store_factory=create_store,
+                    dense_factory=create_dense):
     has_diagnosis = input("Do you have a diagnostic assessment? (yes/no): ").lower()
-    
+    while has_diagnosis not in ("yes", "no"):
+        print("Invalid input. Please answer 'yes' or 'no'.")
+        has_diagnosis = input("Do you have a diagnostic assessment? (yes/no): ").lower()
+
     if has_diagnosis == "yes":
+        from Rehabilitation_assessment import SCORES_DIR, rehabilitation_assessment_workflow
+
         diagnosis_id = input("Please enter the diagnostic assessment ID: ")
-        file_path = f'/content/drive/MyDrive/240814_Llama_RAG/{diagnosis_id}.csv'
-        rehabilitation_assessment_workflow(llm, docs, file_path)
-    elif has_diagnosis == "no":
-        Diagnosis_Process()
+        file_path = f'{SCORES_DIR}/{diagnosis_id}.csv'
+        rehabilitation_assessment_workflow(llm_factory(), docs, file_path, store=store_factory(), stream=stream,
+                                           dense=dense_factory())
     else:
-        print("Invalid input. Please answer 'yes' or 'no'.")
-        check_diagnosis(llm, docs)  # Recursively call the function to get correct input
+        from Diagnosis_process import Diagnosis_Process
+        from response_cache import ResponseCache
+
+        Diagnosis_Process(llm_factory(), docs, stream=stream, response_cache=ResponseCache(), dense=dense_factory())
 
 if __name__ == "__main__":
-    # Initialize the language model and document list
-    llm = ChatUpstage(temperature=0)
-    docs = load_documents('path/data')
-    check_diagnosis(llm, docs)
\ No newline at end of file
+    from tracing import export_on_exit
+
+    export_on_exit()
+    # Documents are loaded on demand, only for the branch that is chosen
+    docs = DocumentRegistry('path/data', max_workers=4)
+    check_diagnosis(docs, stream=True)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from digests import resolve_context
+from tracing import tracer
+
+PREFETCH_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the process-wide prefetch thread pool, creating it on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+def submit(name, func, *args, **kwargs):
+    """
+    Runs func in the background and returns its Future. The work is traced
+    as the span "prefetch.<name>".
+    """
+    def run():
+        with tracer.span(f"prefetch.{name}"):
+            return func(*args, **kwargs)
+
+    return get_executor().submit(run)
+
+
+def join(name, future):
+    """
+    Waits for a prefetched result. Counts whether it was already finished
+    (prefetch.ready) or the caller had to wait for it (prefetch.waited), and
+    re-raises any exception the background work raised.
+    """
+    tracer.incr("prefetch.ready" if future.done() else "prefetch.waited")
+    with tracer.span(f"prefetch.{name}.wait"):
+        return future.result()
+
+
+def cancel(future):
+    """
+    Drops prefetched work that is no longer needed. A future that has not
+    started is cancelled outright; prefetch_context work that is already
+    loading documents stops before it asks the LLM for summaries.
+    """
+    stop = getattr(future, "stop_event", None)
+    if stop is not None:
+        stop.set()
+    return future.cancel()
+
+
+def prefetch_context(llm, docs, indices, queries, digest=None, index=None, dense=None):
+    """
+    Starts loading the given documents and resolving their context summaries
+    (digest lookup, live RAG on a miss) in the background. Progress output is
+    suppressed so it does not interleave with the input prompts.
+
+    :param llm: Chat model used for live summaries
+    :param docs: Document corpus (a DocumentRegistry is preloaded quietly)
+    :param indices: Corpus positions of the documents the workflow uses
+    :param queries: Retrieval queries
+    :param dense: DenseIndexStore for hybrid retrieval, None for BM25 only
+    :return: Future resolving to the resolve_context result; pass it to
+        cancel() if the result will not be used
+    """
+    stop = threading.Event()
+
+    def run():
+        if hasattr(docs, "preload"):
+            docs.preload(indices, verbose=False)
+        if stop.is_set():
+            raise CancelledError()
+        docs_list = [docs[i] for i in indices]
+        return resolve_context(docs_list, queries, llm=llm, digest=digest, index=index, dense=dense,
+                               verbose=False)
+
+    future = submit("context", run)
+    future.stop_event = stop
+    return future
@@ -0,0 +1,48 @@
+def _yes(answer):
+    return answer.strip().lower() == "yes"
+
+
+def _age_out_of_range(answer):
+    answer = answer.strip()
+    return answer.isdigit() and (int(answer) < 20 or int(answer) > 50)
+
+
+# (red flag, intake key, rule) for the red flags listed in the diagnosis
+# prompt that map onto an intake question. "Failure to improve with
+# treatment" has no intake question and is left to the LLM.
+RED_FLAG_RULES = [
+    ("Fever", "patient's fever", _yes),
+    ("Unexplained weight loss", "patient's weight loss/appetite", _yes),
+    ("History of cancer or steroid use", "patient's cancer/steroid history", _yes),
+    ("History of violent trauma", "patient's trauma history", _yes),
+    ("Osteoporosis", "patient's osteoporosis", _yes),
+    ("Aged younger than 20 years or older than 50 years", "patient's age", _age_out_of_range),
+    ("History of alcohol or drug abuse", "patient's alcohol/drug use", _yes),
+    ("HIV", "patient's HIV status", _yes),
+    ("Lower extremity spasticity", "patient's leg bending difficulty", _yes),
+    ("Loss of bowel or bladder function", "patient's urinary/fecal incontinence", _yes),
+]
+
+
+def screen_red_flags(patient_data):
+    """
+    Evaluates the red flag rules against an intake.
+
+    :param patient_data: Dict of answers keyed like Diagnosis_process.QUESTIONS
+    :return: List of {"flag", "field", "answer"} dicts, one per red flag present
+    """
+    flags = []
+    for flag, key, rule in RED_FLAG_RULES:
+        answer = patient_data.get(key)
+        if answer is not None and rule(str(answer)):
+            flags.append({"flag": flag, "field": key, "answer": str(answer)})
+    return flags
+
+
+def format_red_flag_result(flags):
+    """
+    Formats red flags the way the diagnosis prompt's examples report them.
+    """
+    names = ", ".join(f'"{f["flag"]}"' for f in flags)
+    evidence = "\n".join(f'- {f["flag"]} (evidence: {f["field"]} = {f["answer"]})' for f in flags)
+    return f"finding red flags: Red flags present: {names}. Urgent hospital visit recommended.\n{evidence}"
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from document_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_RESPONSE_DB = os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite3")
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def canonicalize_answer(answer):
+    """
+    Normalizes one intake answer: case, surrounding and repeated whitespace,
+    and leading zeros on numbers ("040" -> "40").
+    """
+    answer = _SPACE_RE.sub(" ", str(answer)).strip().lower()
+    if answer.isdigit():
+        answer = str(int(answer))
+    return answer
+
+
+def canonicalize_intake(patient_data):
+    """
+    Returns a canonical, order-independent form of an intake dict.
+    """
+    return {key: canonicalize_answer(value) for key, value in sorted(patient_data.items())}
+
+
+def response_key(patient_data, template, corpus_version, model=None):
+    """
+    Builds the cache key for a response from the canonical intake, the full
+    prompt text it is rendered into, the corpus version and the model.
+    """
+    payload = json.dumps(
+        {
+            "intake": canonicalize_intake(patient_data),
+            "template": template,
+            "corpus": corpus_version,
+            "model": model,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses with LRU eviction, an optional
+    TTL and a total size limit.
+    """
+
+    def __init__(self, db_path=DEFAULT_RESPONSE_DB, max_entries=10000, max_bytes=64 << 20, ttl=None):
+        """
+        :param db_path: SQLite database path (":memory:" for a process-local cache)
+        :param max_entries: Maximum number of cached responses
+        :param max_bytes: Maximum total size of cached responses
+        :param ttl: Seconds after which a response expires (default: None, never)
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Returns the cached response for a key, or None on a miss or expiry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters, the hit ratio and the current size.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
@@ -0,0 +1,226 @@
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+NUM_ITEMS = 17
+ITEM_NAMES = [
+    "Reach fwd", "Reach Up", "Reach Down", "Lift Up", "Push Down",
+    "Wrist Up", "Acquire - Release", "Grasp Dynamometer", "Lateral Pinch",
+    "Pull Weight", "Push Weight", "Container", "Pinch Die", "Pencil",
+    "Manipulate (chip)", "Push Index", "Push Thumb"
+]
+# Patient records are clinical data, not a cache: there is deliberately no
+# default location under RECONECT_CACHE_DIR. Entry points read the database
+# path from this variable (or --score-db).
+SCORE_DB_ENV = "RECONECT_SCORE_DB"
+
+_ITEMS = range(1, NUM_ITEMS + 1)
+_VALUE_COLS = [f"item_{i}" for i in _ITEMS]
+_SUM_COLS = [f"sum_{i}" for i in _ITEMS]
+_CNT_COLS = [f"cnt_{i}" for i in _ITEMS]
+
+
+def _to_date(date):
+    if date is None:
+        return datetime.now()
+    if isinstance(date, str):
+        return datetime.strptime(date, "%Y-%m-%d")
+    return date
+
+
+class ScoreStore:
+    """
+    Time-indexed SQLite store of CUE-T item scores.
+
+    Every session row also carries running (prefix) sums and counts of each
+    item over the patient's history, so the sum over any trailing window is
+    the difference of two rows found through the (patient_id, ts) index.
+    The 7-day average therefore costs two index lookups however long the
+    history grows.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: SQLite database path (":memory:" for a process-local store)
+        """
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{c} REAL" for c in _VALUE_COLS + _SUM_COLS + _CNT_COLS)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS sessions ("
+            f"id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id TEXT NOT NULL, ts REAL NOT NULL, {columns})"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_patient_ts ON sessions (patient_id, ts, id)")
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "session_id" not in existing:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN session_id TEXT")
+        # Sessions recorded without an id (NULL) never collide
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS sessions_session_id ON sessions (patient_id, session_id)"
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def has_patient(self, patient_id):
+        row = self._conn.execute(
+            "SELECT 1 FROM sessions WHERE patient_id = ? LIMIT 1", (patient_id,)
+        ).fetchone()
+        return row is not None
+
+    def _prefix_at(self, patient_id, ts=None):
+        """
+        Returns (sums, counts) of the last row at or before ts, or zeros.
+        """
+        query = f"SELECT {', '.join(_SUM_COLS + _CNT_COLS)} FROM sessions WHERE patient_id = ?"
+        params = [patient_id]
+        if ts is not None:
+            query += " AND ts <= ?"
+            params.append(ts)
+        query += " ORDER BY ts DESC, id DESC LIMIT 1"
+        row = self._conn.execute(query, params).fetchone()
+        if row is None:
+            return [0.0] * NUM_ITEMS, [0] * NUM_ITEMS
+        return list(row[:NUM_ITEMS]), list(row[NUM_ITEMS:])
+
+    def _insert(self, patient_id, ts, scores, session_id=None):
+        values = [None if s is None or (isinstance(s, float) and math.isnan(s)) else float(s) for s in scores]
+        last = self._conn.execute(
+            "SELECT ts FROM sessions WHERE patient_id = ? ORDER BY ts DESC, id DESC LIMIT 1", (patient_id,)
+        ).fetchone()
+
+        sums, counts = self._prefix_at(patient_id, ts)
+        for k, v in enumerate(values):
+            if v is not None:
+                sums[k] += v
+                counts[k] += 1
+
+        placeholders = ", ".join("?" * (2 + 3 * NUM_ITEMS))
+        self._conn.execute(
+            f"INSERT INTO sessions (patient_id, ts, session_id, {', '.join(_VALUE_COLS + _SUM_COLS + _CNT_COLS)}) "
+            f"VALUES (?, {placeholders})",
+            [patient_id, ts, session_id] + values + sums + counts,
+        )
+
+        if last is not None and ts < last[0]:
+            self._rebuild_from(patient_id, ts)
+
+    def _rebuild_from(self, patient_id, ts):
+        """
+        Recomputes running sums for rows after an out-of-order insert.
+        """
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(_VALUE_COLS)} FROM sessions WHERE patient_id = ? AND ts > ? "
+            f"ORDER BY ts, id",
+            (patient_id, ts),
+        ).fetchall()
+        sums, counts = self._prefix_at(patient_id, ts)
+        assignments = ", ".join(f"{c} = ?" for c in _SUM_COLS + _CNT_COLS)
+        for row in rows:
+            for k, v in enumerate(row[1:]):
+                if v is not None:
+                    sums[k] += v
+                    counts[k] += 1
+            self._conn.execute(f"UPDATE sessions SET {assignments} WHERE id = ?", sums + counts + [row[0]])
+
+    def append(self, patient_id, scores, when=None, session_id=None):
+        """
+        Records one session of item scores.
+
+        :param patient_id: Diagnostic assessment ID
+        :param scores: List of 17 item scores
+        :param when: Session datetime (default: None, uses now)
+        :param session_id: Optional id of the session (e.g. the intake id); a
+            session already recorded under this id is not recorded again
+        :return: True if the session was recorded, False if it already was
+        """
+        if len(scores) != NUM_ITEMS:
+            raise ValueError(f"Expected {NUM_ITEMS} item scores, got {len(scores)}")
+        ts = _to_date(when).timestamp()
+        with self._lock:
+            if session_id is not None:
+                session_id = str(session_id)
+                row = self._conn.execute(
+                    "SELECT 1 FROM sessions WHERE patient_id = ? AND session_id = ? LIMIT 1", (patient_id, session_id)
+                ).fetchone()
+                if row is not None:
+                    return False
+            self._insert(patient_id, ts, scores, session_id)
+            self._conn.commit()
+        return True
+
+    def _import_rows(self, patient_id, df):
+        df = df.sort_values("datetime", kind="stable")
+        item_columns = [f"Item {i}" for i in _ITEMS]
+        for when, scores in zip(df["datetime"], df[item_columns].itertuples(index=False)):
+            self._insert(patient_id, when.to_pydatetime().timestamp(), list(scores))
+        return len(df)
+
+    def import_csv(self, patient_id, file_path):
+        """
+        Imports a per-ID CSV with a 'datetime' column and 'Item 1'..'Item 17' columns.
+
+        :return: Number of sessions imported
+        """
+        df = pd.read_csv(file_path, parse_dates=["datetime"])
+        with self._lock:
+            count = self._import_rows(patient_id, df)
+            self._conn.commit()
+        return count
+
+    def import_csv_if_absent(self, patient_id, file_path):
+        """
+        Imports a per-ID CSV unless the store already has sessions for the
+        patient. The check and the import run in one transaction under the
+        store's lock, so concurrent first assessments import the history once.
+
+        :return: Number of sessions imported (0 if the patient was already known)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.has_patient(patient_id):
+                    self._conn.rollback()
+                    return 0
+                count = self._import_rows(patient_id, pd.read_csv(file_path, parse_dates=["datetime"]))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return count
+
+    def window_average(self, patient_id, date=None, days=7):
+        """
+        Averages each item over sessions after (date - days), matching
+        calculate_7day_average. Items without data average to NaN.
+
+        :param patient_id: Diagnostic assessment ID
+        :param date: Reference date (default: None, uses today's date if None)
+        :param days: Window length in days
+        :return: List of 17 average values
+        """
+        cutoff = (_to_date(date) - timedelta(days=days)).timestamp()
+        with self._lock:
+            total_sums, total_counts = self._prefix_at(patient_id)
+            old_sums, old_counts = self._prefix_at(patient_id, cutoff)
+
+        averages = []
+        for k in range(NUM_ITEMS):
+            count = total_counts[k] - old_counts[k]
+            if count:
+                averages.append(round((total_sums[k] - old_sums[k]) / count, 2))
+            else:
+                averages.append(float("nan"))
+        return averages
+
+    def seven_day_average(self, patient_id, date=None):
+        return self.window_average(patient_id, date, days=7)
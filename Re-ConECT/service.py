@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+
+from Diagnosis_process import diagnose, validate_patient_data
+from red_flags import format_red_flag_result, screen_red_flags
+from Rehabilitation_assessment import (
+    SCORES_DIR,
+    calculate_7day_average,
+    compare_scores,
+    rehabilitation_evaluation,
+    stored_7day_average,
+    validate_item_scores,
+)
+from tracing import tracer
+
+PATIENT_INFO_FIELDS = ["disability", "functional_evaluation", "new_symptoms"]
+
+def parse_flag(value, default=False):
+    """
+    Reads a boolean intake field. Accepts JSON booleans and the strings
+    true/false, yes/no and 1/0 (CSV columns arrive as strings).
+
+    :raises ValueError: For any other value
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "1"):
+        return True
+    if text in ("false", "no", "0"):
+        return False
+    raise ValueError(f"invalid boolean {value!r}")
+
+
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ReConECTService:
+    """
+    Non-interactive entry point to the diagnosis and assessment workflows.
+
+    One service instance holds the loaded documents and a single chat model
+    client (whose HTTP connection pool is shared by every request) and runs
+    up to max_concurrency patients at a time. With a DenseIndexStore as
+    dense, context retrieval is hybrid BM25 + dense.
+    """
+
+    def __init__(self, llm, docs, store=None, scores_dir=SCORES_DIR, max_concurrency=8, response_cache=None,
+                 dense=None):
+        self.llm = llm
+        self.docs = docs
+        self.store = store
+        self.dense = dense
+        self.response_cache = response_cache
+        self.scores_dir = scores_dir
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, func, *args):
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    def diagnose_sync(self, intake):
+        full_assessment = parse_flag(intake.get("full_assessment"))
+        patient_data = validate_patient_data(intake)
+        flags = screen_red_flags(patient_data)
+        if flags and not full_assessment:
+            return {"result": format_red_flag_result(flags), "urgent": True, "red_flags": flags}
+
+        result = diagnose(self.llm, self.docs, patient_data, response_cache=self.response_cache,
+                          red_flag_screen=False, dense=self.dense)
+        return {"result": result, "urgent": bool(flags), "red_flags": flags}
+
+    def assess_sync(self, intake):
+        patient_id = str(intake.get("patient_id", "")).strip()
+        if not patient_id:
+            raise ValueError("missing 'patient_id'")
+        current_scores = validate_item_scores(intake.get("scores"))
+        record = parse_flag(intake.get("record"), default=True)
+        info = intake.get("patient_info") or {}
+        missing = [field for field in PATIENT_INFO_FIELDS if not str(info.get(field, "")).strip()]
+        if missing:
+            raise ValueError(f"missing patient_info fields: {', '.join(missing)}")
+        patient_info = [str(info[field]).strip() for field in PATIENT_INFO_FIELDS]
+
+        # The store imports the patient's CSV history on first use, like the CLI
+        file_path = os.path.join(self.scores_dir, f"{patient_id}.csv")
+        known = os.path.exists(file_path) or (self.store is not None and self.store.has_patient(patient_id))
+        if not known:
+            raise LookupError(f"no score history for patient {patient_id!r}")
+        if self.store is not None:
+            average_scores = stored_7day_average(self.store, patient_id, file_path, intake.get("date"))
+        else:
+            average_scores = calculate_7day_average(file_path, intake.get("date"))
+
+        warnings = []
+        if all(math.isnan(score) for score in average_scores):
+            warnings.append("no scores in the 7 days before this session; no item can be reported as declined")
+
+        decreased_items = compare_scores(current_scores, average_scores)
+        result = rehabilitation_evaluation(self.llm, self.docs, decreased_items, patient_info, dense=self.dense)
+        if self.store is not None and record:
+            # Keyed on the intake id, so a rerun intake is not recorded twice
+            self.store.append(patient_id, current_scores, intake.get("date"), session_id=intake.get("id"))
+
+        return {
+            "patient_id": patient_id,
+            "average_scores": [None if math.isnan(score) else score for score in average_scores],
+            "decreased_items": decreased_items,
+            "warnings": warnings,
+            "result": result,
+        }
+
+    async def diagnose(self, intake):
+        """
+        Runs the diagnosis workflow for a JSON intake keyed like Diagnosis_process.QUESTIONS.
+        Intakes with red flags get the urgent-visit result without an LLM call
+        unless "full_assessment" is true.
+
+        :raises ValueError: If the intake fails validation
+        """
+        return await self._run(self.diagnose_sync, intake)
+
+    async def assess(self, intake):
+        """
+        Runs the rehabilitation assessment for a JSON intake:
+        {"patient_id": ..., "scores": [17 numbers], "patient_info": {"disability", "functional_evaluation", "new_symptoms"}}
+        With a store, the session is recorded unless "record" is false; an
+        intake with an "id" is recorded at most once.
+
+        :raises ValueError: If the intake fails validation
+        :raises LookupError: If the patient has no score history
+        """
+        return await self._run(self.assess_sync, intake)
+
+
+async def _write_response(writer, status, payload, content_type="application/json"):
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+        f"Content-Type: {content_type}; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("ascii") + body)
+    await writer.drain()
+
+
+async def _handle(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return await _write_response(writer, 400, {"error": "malformed request"})
+
+        method, path = request_line[0], request_line[1]
+        routes = {"/diagnosis": service.diagnose, "/assessment": service.assess}
+        if path == "/health":
+            return await _write_response(writer, 200, {"status": "ok"})
+        if path == "/metrics":
+            return await _write_response(writer, 200, tracer.export_prometheus(), "text/plain; version=0.0.4")
+        if path not in routes:
+            return await _write_response(writer, 404, {"error": f"unknown path {path}"})
+        if method != "POST":
+            return await _write_response(writer, 405, {"error": "use POST"})
+
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            return await _write_response(writer, 400, {"error": f"invalid Content-Length {length!r}"})
+        try:
+            body = await reader.readexactly(int(length))
+        except asyncio.IncompleteReadError:
+            return await _write_response(writer, 400, {"error": "request body shorter than Content-Length"})
+        try:
+            intake = json.loads(body or b"{}")
+            if not isinstance(intake, dict):
+                raise ValueError("intake must be a JSON object")
+            result = await routes[path](intake)
+        except ValueError as e:
+            return await _write_response(writer, 400, {"error": str(e)})
+        except LookupError as e:
+            return await _write_response(writer, 404, {"error": str(e)})
+        await _write_response(writer, 200, result)
+    except Exception as e:
+        await _write_response(writer, 500, {"error": repr(e)})
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8080):
+    """
+    Serves the workflows over HTTP: POST /diagnosis and POST /assessment with
+    JSON intakes, GET /health for liveness and GET /metrics for stage timings
+    and counters in the Prometheus text format (empty unless RECONECT_TRACE=1).
+    """
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    print(f"Re-ConECT service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    from main import create_dense, create_llm
+    from RAG import load_documents
+    from response_cache import ResponseCache
+    from score_store import SCORE_DB_ENV, ScoreStore
+
+    parser = argparse.ArgumentParser(description="Serve the Re-ConECT workflows over HTTP.")
+    parser.add_argument("pdf_files", nargs="+", help="Corpus PDF files, in corpus order")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--llm", choices=["upstage", "local"], help="Chat model backend (default: RECONECT_LLM or upstage)")
+    parser.add_argument("--retrieval", choices=["bm25", "hybrid"],
+                        help="Retrieval mode (default: RECONECT_RETRIEVAL or bm25)")
+    parser.add_argument("--score-db", default=os.environ.get(SCORE_DB_ENV),
+                        help=f"ScoreStore database for assessments (default: ${SCORE_DB_ENV}, else per-ID CSVs)")
+    args = parser.parse_args()
+
+    async def main():
+        service = ReConECTService(
+            create_llm(args.llm), load_documents(args.pdf_files),
+            store=ScoreStore(args.score_db) if args.score_db else None, max_concurrency=args.max_concurrency,
+            response_cache=ResponseCache(), dense=create_dense(args.retrieval),
+        )
+        await serve(service, args.host, args.port)
+
+    asyncio.run(main())
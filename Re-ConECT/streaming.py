@@ -0,0 +1,56 @@
+import time
+
+
+def stream_chain(chain, inputs, on_token=None, echo=True, config=None):
+    """
+    Runs a chain with chain.stream, handing each token out as it arrives.
+
+    :param chain: Runnable ending in StrOutputParser
+    :param inputs: Chain input dict
+    :param on_token: Optional callback called with each token
+    :param echo: Print tokens to the terminal as they arrive
+    :param config: Optional runnable config (e.g. callbacks)
+    :return: Tuple (full text, stats dict with time_to_first_token and total_latency in seconds)
+    """
+    start = time.perf_counter()
+    first = None
+    parts = []
+    for token in chain.stream(inputs, config):
+        if first is None:
+            first = time.perf_counter() - start
+        parts.append(token)
+        if on_token is not None:
+            on_token(token)
+        if echo:
+            print(token, end="", flush=True)
+    if echo:
+        print()
+
+    stats = {"time_to_first_token": first, "total_latency": time.perf_counter() - start}
+    return "".join(parts), stats
+
+
+async def astream_chain(chain, inputs, stats=None, config=None):
+    """
+    Async iterator over a chain's tokens using chain.astream.
+
+    :param chain: Runnable ending in StrOutputParser
+    :param inputs: Chain input dict
+    :param stats: Optional dict filled with time_to_first_token and total_latency
+    :param config: Optional runnable config (e.g. callbacks)
+    """
+    start = time.perf_counter()
+    first = None
+    async for token in chain.astream(inputs, config):
+        if first is None:
+            first = time.perf_counter() - start
+        yield token
+    if stats is not None:
+        stats["time_to_first_token"] = first
+        stats["total_latency"] = time.perf_counter() - start
+
+
+def print_stream_stats(stats):
+    ttft = stats["time_to_first_token"]
+    ttft = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    print(f"(time to first token: {ttft}, total: {stats['total_latency']:.2f}s)")
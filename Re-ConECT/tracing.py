@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, duration, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Collects stage spans and counters for the RAG and LLM pipeline.
+
+    While disabled, span() returns a shared no-op context manager and incr()
+    returns immediately, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled=False, max_spans=100000):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self._handler = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.counters = defaultdict(float)
+            self._stage_totals = defaultdict(lambda: [0, 0.0])
+
+    def span(self, name, **attrs):
+        """
+        Times a stage: `with tracer.span("rag.retrieve", doc=i) as span: ...`.
+        Extra attributes can be attached later with span.set(...).
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def _record(self, name, start, duration, attrs):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append({"name": name, "start": start, "duration": duration, **attrs})
+            totals = self._stage_totals[name]
+            totals[0] += 1
+            totals[1] += duration
+
+    def config(self, **config):
+        """
+        Returns a runnable config that adds the token usage callback when enabled.
+        """
+        if self.enabled:
+            if self._handler is None:
+                self._handler = _usage_handler(self)
+            config["callbacks"] = [self._handler]
+        return config
+
+    def summary(self):
+        """
+        Returns per-stage counts and durations plus counters and cache hit ratios.
+        """
+        with self._lock:
+            stages = {
+                name: {"count": count, "total_seconds": total, "mean_seconds": total / count}
+                for name, (count, total) in self._stage_totals.items()
+            }
+            counters = dict(self.counters)
+
+        ratios = {}
+        prefixes = {name.rsplit(".", 1)[0] for name in counters if name.endswith((".hits", ".misses"))}
+        for prefix in prefixes:
+            hits = counters.get(f"{prefix}.hits", 0)
+            lookups = hits + counters.get(f"{prefix}.misses", 0)
+            ratios[f"{prefix}.hit_ratio"] = hits / lookups if lookups else 0.0
+        return {"stages": stages, "counters": counters, "ratios": ratios}
+
+    def export_json(self, path=None):
+        """
+        Returns the recorded spans as JSON lines followed by one summary line.
+        If path is given the lines are appended to that file.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        lines = [json.dumps({"type": "span", **s}, default=str) for s in spans]
+        lines.append(json.dumps({"type": "summary", **self.summary()}, default=str))
+        text = "\n".join(lines) + "\n"
+        if path is not None:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def export_prometheus(self, prefix="reconect"):
+        """
+        Returns stage timings and counters in the Prometheus text format.
+        """
+        summary = self.summary()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, stage in sorted(summary["stages"].items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["total_seconds"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        for name, value in sorted(summary["counters"].items()):
+            metric = f"{prefix}_{name.replace('.', '_')}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:g}")
+        for name, value in sorted(summary["ratios"].items()):
+            metric = f"{prefix}_{name.replace('.', '_')}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _usage_handler(tracer):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class UsageHandler(BaseCallbackHandler):
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            tracer.incr("llm.calls")
+            tracer.incr("llm.prompt_chars", sum(len(str(m.content)) for batch in messages for m in batch))
+
+        def on_llm_start(self, serialized, prompts, **kwargs):
+            tracer.incr("llm.calls")
+            tracer.incr("llm.prompt_chars", sum(len(p) for p in prompts))
+
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            if usage:
+                tracer.incr("llm.prompt_tokens", usage.get("prompt_tokens", 0))
+                tracer.incr("llm.completion_tokens", usage.get("completion_tokens", 0))
+                return
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    tracer.incr("llm.prompt_tokens", metadata.get("input_tokens", 0))
+                    tracer.incr("llm.completion_tokens", metadata.get("output_tokens", 0))
+
+    return UsageHandler()
+
+
+tracer = Tracer(enabled=os.environ.get("RECONECT_TRACE") == "1")
+
+
+def export_on_exit(path=None):
+    """
+    Appends the recorded spans and summary as JSON lines to path (default:
+    $RECONECT_TRACE_FILE) when the process exits. Does nothing if tracing is
+    disabled or no path is set.
+    """
+    path = path or os.environ.get("RECONECT_TRACE_FILE")
+    if tracer.enabled and path:
+        atexit.register(tracer.export_json, path)
@@ -0,0 +1,84 @@
+"""
+Scaling benchmark for cohort-wide decline detection.
+
+Compares the vectorized cohort_decline_matrix against the per-patient
+calculate_7day_average + compare_scores loop (on a sample, extrapolated).
+
+    python benchmarks/bench_cohort.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Re-ConECT"))
+
+from cohort import ITEM_COLUMNS, cohort_decline_matrix  # noqa: E402
+from score_store import ITEM_NAMES  # noqa: E402
+
+REFERENCE_DATE = datetime(2026, 1, 31)
+
+
+def synthetic_cohort(n_patients, sessions=14, seed=0):
+    rng = np.random.default_rng(seed)
+    n_rows = n_patients * sessions
+    history = pd.DataFrame(rng.integers(0, 5, size=(n_rows, len(ITEM_COLUMNS))).astype(float), columns=ITEM_COLUMNS)
+    history.insert(0, "patient_id", np.repeat(np.arange(n_patients), sessions))
+    offsets = rng.uniform(0, 14, size=n_rows)
+    history.insert(1, "datetime", REFERENCE_DATE - pd.to_timedelta(offsets, unit="D"))
+    current = pd.DataFrame(
+        rng.integers(0, 5, size=(n_patients, len(ITEM_COLUMNS))).astype(float),
+        columns=ITEM_COLUMNS,
+        index=pd.Index(np.arange(n_patients), name="patient_id"),
+    )
+    return history, current
+
+
+def per_patient_loop(history, current):
+    """
+    Mirrors calculate_7day_average + compare_scores applied one patient at a time.
+    """
+    flagged = {}
+    cutoff = REFERENCE_DATE - timedelta(days=7)
+    for patient_id, df in history.groupby("patient_id"):
+        df_recent = df[df["datetime"] > cutoff]
+        averages = [round(df_recent[c].mean(), 2) for c in ITEM_COLUMNS]
+        scores = current.loc[patient_id, ITEM_COLUMNS].tolist()
+        flagged[patient_id] = [ITEM_NAMES[i] for i, (c, a) in enumerate(zip(scores, averages)) if c < a]
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--sessions", type=int, default=14, help="Sessions per patient")
+    parser.add_argument("--loop-sample", type=int, default=1000, help="Patients timed with the per-patient loop")
+    args = parser.parse_args()
+
+    print(f"{'patients':>10} {'rows':>10} {'vectorized (s)':>15} {'loop est. (s)':>14} {'speedup':>8}")
+    for n in args.sizes:
+        history, current = synthetic_cohort(n, args.sessions)
+
+        start = time.perf_counter()
+        matrix = cohort_decline_matrix(history, current, REFERENCE_DATE)
+        vectorized = time.perf_counter() - start
+
+        sample = min(n, args.loop_sample)
+        sample_history = history[history["patient_id"] < sample]
+        start = time.perf_counter()
+        flagged = per_patient_loop(sample_history, current)
+        loop = (time.perf_counter() - start) * n / sample
+
+        # Both paths must agree on the sampled patients
+        for patient_id, items in flagged.items():
+            assert [name for name in ITEM_NAMES if matrix.loc[patient_id, name]] == items
+
+        print(f"{n:>10} {len(history):>10} {vectorized:>15.3f} {loop:>14.3f} {loop / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Local backend benchmark: one prompt at a time vs dynamic micro-batching vs
+micro-batching with the prefix cache, under concurrent load.
+
+Every request shares a long instruction header and ends with its own
+synthetic intake, like the workflow prompts. Without --model a tiny random
+Llama is built in a temporary directory, so this runs on CPU with no
+download; pass a model id or directory to measure a real model.
+
+    python benchmarks/bench_local_llm.py --requests 32 --concurrency 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "Re-ConECT"))
+
+
+def build_prompts(requests, header_chars):
+    from synthetic import synthetic_intake, synthetic_pages
+
+    header = " ".join(page.page_content for page in synthetic_pages("instructions", 4, header_chars))
+    header = "You are a renowned rehabilitation medicine specialist.\n" + header[:header_chars]
+    prompts = []
+    for seed in range(requests):
+        intake = "\n".join(f"{key}: {value}" for key, value in synthetic_intake(seed).items())
+        prompts.append(f"{header}\n---\n{intake}\n---\nAssessment:")
+    return prompts
+
+
+def run(engine, prompts, concurrency, max_new_tokens):
+    latencies = []
+
+    def one(prompt):
+        start = time.perf_counter()
+        output = engine.submit(prompt, max_new_tokens).result()
+        latencies.append(time.perf_counter() - start)
+        return output
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outputs = list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - start
+    tokens = sum(output["completion_tokens"] for output in outputs)
+    return outputs, {
+        "tokens_per_s": tokens / elapsed,
+        "requests_per_s": len(prompts) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Model id or directory (default: a tiny random Llama)")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.01)
+    parser.add_argument("--header-chars", type=int, default=4000, help="Length of the shared prompt header")
+    args = parser.parse_args()
+
+    from fakes import build_tiny_llama
+    from local_llm import InferenceEngine, load_local_model
+
+    model_id = args.model or build_tiny_llama(tempfile.mkdtemp(prefix="reconect-tiny-llama-"))
+    tokenizer, model = load_local_model(model_id)
+    prompts = build_prompts(args.requests, args.header_chars)
+    print(f"model={args.model or 'tiny random Llama'} prompt_tokens~{len(tokenizer(prompts[0])['input_ids'])} "
+          f"requests={args.requests} concurrency={args.concurrency} max_new_tokens={args.max_new_tokens}")
+
+    scenarios = [
+        ("one prompt at a time", {"max_batch_size": 1, "max_prefixes": 0}),
+        ("micro-batched", {"max_batch_size": args.max_batch_size, "max_prefixes": 0}),
+        ("micro-batched + prefix cache", {"max_batch_size": args.max_batch_size}),
+    ]
+    print(f"{'path':<30} {'tokens/s':>9} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'batch':>6} {'same output':>12}")
+    baseline = None
+    for name, options in scenarios:
+        engine = InferenceEngine(tokenizer, model, max_wait=args.max_wait, **options)
+        run(engine, prompts[:2], 1, 2)
+        engine.counts.update(requests=0, batches=0)
+        outputs, stats = run(engine, prompts, args.concurrency, args.max_new_tokens)
+        engine.close()
+        texts = [output["text"] for output in outputs]
+        baseline = baseline or texts
+        same = sum(a == b for a, b in zip(texts, baseline))
+        print(f"{name:<30} {stats['tokens_per_s']:>9.1f} {stats['requests_per_s']:>7.2f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {engine.stats()['mean_batch_size']:>6.2f} {same:>8}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Retrieval benchmark: per-request re-index vs prebuilt BM25 vs hybrid BM25 + dense.
+
+The re-index path mirrors the original process_documents (split and fit BM25
+on every request). The hybrid path uses DenseIndexStore with a
+sentence-transformers model, or a hashed bag-of-words embedder when
+--hashed-embeddings is given (no model download).
+
+    python benchmarks/bench_retrieval.py --requests 20
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "Re-ConECT"))
+
+QUERIES = ["upper extremity, complications", "shoulder pain after stroke", "dizziness when standing up"]
+
+
+def hashed_embedder(dim=256):
+    def embed(texts):
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1.0
+        return vectors
+    return embed
+
+
+def timed(func, requests):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / requests * 1000, peak / (1 << 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--hashed-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["RECONECT_CACHE_DIR"] = tempfile.mkdtemp(prefix="reconect-retrieval-")
+
+    from bm25_index import BM25IndexStore, build_index
+    from dense_index import DenseIndexStore
+    from synthetic import synthetic_corpus
+
+    docs = synthetic_corpus(4, args.pages)
+    bm25 = BM25IndexStore(index_dir=None)
+    dense = DenseIndexStore(embed=hashed_embedder() if args.hashed_embeddings else None)
+    for doc in docs:
+        index = bm25.get(doc)
+        dense.matrix(doc, index["chunks"], index["splitter_options"])
+
+    def reindex():
+        for doc in docs:
+            retriever = build_index(doc)["retriever"]
+            for query in QUERIES:
+                retriever.invoke(query)
+
+    def prebuilt():
+        for doc in docs:
+            retriever = bm25.get_retriever(doc)
+            for query in QUERIES:
+                retriever.invoke(query)
+
+    def hybrid():
+        query_vectors = dense.embed(QUERIES)
+        for doc in docs:
+            index = bm25.get(doc)
+            for query, vector in zip(QUERIES, query_vectors):
+                dense.hybrid_search(index, doc, query, query_vector=vector)
+
+    print(f"{'path':<28} {'ms/request':>11} {'peak MB':>8}")
+    for name, func in [("re-index per request", reindex), ("prebuilt BM25", prebuilt), ("hybrid BM25 + dense", hybrid)]:
+        ms, peak = timed(func, args.requests)
+        print(f"{name:<28} {ms:>11.2f} {peak:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Startup benchmark for main.py.
+
+Measures, in fresh interpreters, the time until main.py is imported and ready
+to ask its first question, against the eager imports the old main.py did at
+module load. Also compares loading only one branch's documents from the lazy
+registry with loading the whole corpus (fake loader, configurable latency).
+
+    python benchmarks/bench_startup.py --runs 5 --loader-latency 0.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PACKAGE = os.path.join(HERE, "..", "Re-ConECT")
+
+EAGER_IMPORTS = (
+    "import langchain_upstage, langchain_community.retrievers, langchain_text_splitters, "
+    "langchain_core.prompts, pandas"
+)
+
+
+def interpreter_time(code, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PACKAGE, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--loader-latency", type=float, default=0.2, help="Fake seconds to parse one PDF")
+    args = parser.parse_args()
+
+    baseline = interpreter_time("pass", args.runs)
+    lazy = interpreter_time("import main", args.runs) - baseline
+    eager = interpreter_time(f"{EAGER_IMPORTS}; import main", args.runs) - baseline
+
+    print(f"{'import main (lazy)':<36} {lazy * 1000:>9.1f} ms")
+    print(f"{'import main + old eager imports':<36} {eager * 1000:>9.1f} ms")
+
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, PACKAGE)
+    from document_registry import DocumentRegistry
+    from fakes import fake_loader_factory
+
+    workdir = tempfile.mkdtemp(prefix="reconect-startup-")
+    for i in range(8):
+        with open(os.path.join(workdir, f"{i}_doc.pdf"), "wb") as f:
+            f.write(f"synthetic pdf {i}".encode())
+    load_kwargs = {"cache": False, "loader_factory": fake_loader_factory(args.loader_latency)}
+
+    for label, keys in [("load whole corpus", range(8)), ("load assessment branch docs", [3, 5, 6, 7])]:
+        registry = DocumentRegistry(workdir, **load_kwargs)
+        start = time.perf_counter()
+        registry.preload(keys)
+        print(f"{label:<36} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
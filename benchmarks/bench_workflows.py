@@ -0,0 +1,154 @@
+"""
+Offline end-to-end benchmark of the Re-ConECT pipeline stages.
+
+Runs document loading, BM25 indexing, retrieval + summaries, 7-day
+aggregation and both workflows against a fake chat model, a fake PDF loader
+and synthetic data, and reports throughput, latency percentiles and peak
+memory per stage. No network or Google Drive access is needed.
+
+    python benchmarks/bench_workflows.py --iterations 20 --llm-latency 0.05
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "Re-ConECT"))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def measure(name, func, iterations, setup=None):
+    """
+    Runs func `iterations` times (with stdout silenced) and returns a stats dict.
+    setup, if given, runs untimed before each iteration and its result is passed to func.
+    """
+    latencies = []
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(iterations):
+        arg = setup() if setup is not None else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(arg) if setup is not None else func()
+            latencies.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "stage": name,
+        "iterations": iterations,
+        "throughput_per_s": iterations / total if total else float("inf"),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_mem_mb": peak / (1 << 20),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic document")
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=60, help="Sessions per synthetic patient")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake LLM token rate (0 = instant)")
+    parser.add_argument("--loader-latency", type=float, default=0.0, help="Fake PDF loader seconds per file")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="reconect-bench-")
+    os.environ["RECONECT_CACHE_DIR"] = os.path.join(workdir, "cache")
+
+    from bm25_index import BM25IndexStore
+    from Diagnosis_process import diagnose
+    from digests import KnowledgeDigest
+    from document_cache import DocumentCache
+    from fakes import FakeChatModel, fake_loader_factory
+    from RAG import load_documents, process_documents
+    from Rehabilitation_assessment import calculate_7day_average, rehabilitation_evaluation
+    from score_store import ScoreStore
+    from synthetic import synthetic_corpus, synthetic_intake, write_patient_csvs
+
+    llm = FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second)
+    loader_factory = fake_loader_factory(args.loader_latency, args.pages, args.page_chars)
+    pdf_files = []
+    for i in range(8):
+        path = os.path.join(workdir, f"doc_{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(f"synthetic pdf {i}".encode())
+        pdf_files.append(path)
+
+    docs = synthetic_corpus(8, args.pages, args.page_chars)
+    csv_paths = write_patient_csvs(os.path.join(workdir, "patients"), args.patients, args.sessions)
+    store = ScoreStore(os.path.join(workdir, "scores.sqlite3"))
+    for path in csv_paths:
+        store.import_csv(os.path.splitext(os.path.basename(path))[0], path)
+    patient_ids = [os.path.splitext(os.path.basename(p))[0] for p in csv_paths]
+    queries = ["upper extremity, complications"]
+    intake = synthetic_intake()
+    n = args.iterations
+
+    def fresh_cache():
+        return DocumentCache(tempfile.mkdtemp(dir=workdir))
+
+    warm_cache = fresh_cache()
+    load_documents(pdf_files, cache=warm_cache, loader_factory=loader_factory)
+    warm_index = BM25IndexStore(index_dir=None)
+    for doc in docs:
+        warm_index.get(doc)
+
+    results = [
+        measure("load_documents (cold)", lambda cache: load_documents(
+            pdf_files, cache=cache, max_workers=8, loader_factory=loader_factory), n, setup=fresh_cache),
+        measure("load_documents (cache hit)", lambda: load_documents(
+            pdf_files, cache=warm_cache, loader_factory=loader_factory), n),
+        measure("bm25 index build", lambda: [BM25IndexStore(index_dir=None).get(doc) for doc in docs], n),
+        measure("process_documents (warm index)", lambda: process_documents(
+            [docs[i] for i in (3, 5, 6, 7)], queries, index=warm_index, llm=llm), n),
+        measure("7-day average (CSV rescan)", lambda: [calculate_7day_average(p) for p in csv_paths], n),
+        measure("7-day average (score store)", lambda: [store.seven_day_average(p) for p in patient_ids], n),
+        measure("rehabilitation_evaluation (live RAG)", lambda digest: rehabilitation_evaluation(
+            llm, docs, ["Reach Up", "Pinch Die"], ["Activities using arm", "CUE-T", "shoulder pain"]), n,
+            setup=lambda: _reset_digest(KnowledgeDigest)),
+        measure("diagnose", lambda: diagnose(llm, docs, intake), n),
+    ]
+
+    header = f"{'stage':<38} {'n':>4} {'thr/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['stage']:<38} {r['iterations']:>4} {r['throughput_per_s']:>9.1f} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['peak_mem_mb']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+def _reset_digest(digest_cls):
+    import digests
+
+    digests._default_digests = {digests.retrieval_identity(): digest_cls()}
+
+
+if __name__ == "__main__":
+    main()
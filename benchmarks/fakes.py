@@ -0,0 +1,126 @@
+"""
+Deterministic offline stand-ins for the Upstage chat model and PDF loader.
+"""
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with a fixed text after a configurable latency,
+    emitting words at a configurable token rate.
+    """
+
+    response: str = "suspected diagnoses: 1. Muscle strain. further examinations: Plain Radiography. finding red flags: Red flags absent."
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _tokens(self):
+        words = self.response.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _usage(self, messages):
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        return {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": len(self._tokens()),
+            "total_tokens": prompt_chars // 4 + len(self._tokens()),
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency + self._token_delay() * len(self._tokens()))
+        message = AIMessage(content=self.response, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency + self._token_delay() * len(self._tokens()))
+        message = AIMessage(content=self.response, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in self._tokens():
+            time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for token in self._tokens():
+            await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class FakeLoader:
+    """
+    Loader with the UpstageLayoutAnalysisLoader interface that returns
+    synthetic HTML pages after a configurable delay.
+    """
+
+    def __init__(self, pdf_file, latency=0.0, pages=20, page_chars=3000, **options):
+        self.pdf_file = pdf_file
+        self.latency = latency
+        self.pages = pages
+        self.page_chars = page_chars
+
+    def load(self):
+        from synthetic import synthetic_pages
+
+        time.sleep(self.latency)
+        return synthetic_pages(self.pdf_file, self.pages, self.page_chars)
+
+
+def fake_loader_factory(latency=0.0, pages=20, page_chars=3000):
+    def factory(pdf_file, **options):
+        return FakeLoader(pdf_file, latency=latency, pages=pages, page_chars=page_chars, **options)
+    return factory
+
+
+
+def build_tiny_llama(directory, vocab_size=512, hidden_size=64, layers=2, seed=0):
+    """
+    Saves a randomly initialized Llama-architecture model and a byte-level BPE
+    tokenizer trained on synthetic pages to directory, for exercising the
+    local backend on CPU without downloading weights.
+
+    :return: directory
+    """
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    from synthetic import synthetic_pages
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=["<|eos|>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tokenizer.train_from_iterator([page.page_content for page in synthetic_pages("tiny", 20, 3000)], trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<|eos|>")
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=hidden_size, intermediate_size=hidden_size * 2,
+        num_hidden_layers=layers, num_attention_heads=4, num_key_value_heads=2,
+        max_position_embeddings=4096, eos_token_id=tokenizer.eos_token_id,
+    )
+    LlamaForCausalLM(config).save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+    return directory
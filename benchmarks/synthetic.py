@@ -0,0 +1,91 @@
+"""
+Synthetic corpus, patient score histories and intakes for offline benchmarks.
+"""
+import csv
+import os
+import random
+from datetime import datetime, timedelta
+
+from langchain_core.documents import Document
+
+_VOCABULARY = (
+    "neck pain shoulder wrist finger grasp pinch reach upper extremity complication stroke spinal cord injury "
+    "hemiplegic orthostatic hypotension radiculopathy myelopathy spasticity exercise flexion extension "
+    "rotation tenderness numbness tingling weakness sensation reflex Babinski Spurling imaging MRI "
+    "electromyography radiography rehabilitation therapy intent item score manual"
+).split()
+
+
+def synthetic_pages(name, pages=20, page_chars=3000, seed=None):
+    """
+    Returns a list of Documents with HTML-like text, deterministic per name.
+    """
+    rng = random.Random(seed if seed is not None else name)
+    docs = []
+    for page in range(pages):
+        words = []
+        length = 0
+        while length < page_chars:
+            sentence = " ".join(rng.choice(_VOCABULARY) for _ in range(rng.randint(6, 16)))
+            words.append(f"<p id='{page}-{len(words)}'>{sentence}.</p>")
+            length += len(words[-1])
+        docs.append(Document(page_content="\n".join(words), metadata={"source": name, "page": page + 1}))
+    return docs
+
+
+def synthetic_corpus(n_docs=8, pages=20, page_chars=3000):
+    """
+    Returns a corpus shaped like load_documents output (list of document lists).
+    """
+    return [synthetic_pages(f"doc_{i}.pdf", pages, page_chars) for i in range(n_docs)]
+
+
+def write_patient_csvs(directory, n_patients=100, sessions=30, seed=0, end=None):
+    """
+    Writes {patient_id}.csv score histories in the per-ID CSV layout.
+
+    :return: List of written file paths
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for p in range(n_patients):
+        path = os.path.join(directory, f"P{p:06d}.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["datetime"] + [f"Item {i}" for i in range(1, 18)])
+            for s in range(sessions):
+                when = end - timedelta(days=sessions - s, hours=rng.random() * 8)
+                writer.writerow([when.strftime("%Y-%m-%d %H:%M:%S")] + [rng.randint(0, 4) for _ in range(17)])
+        paths.append(path)
+    return paths
+
+
+def synthetic_intake(seed=0, red_flags=False):
+    """
+    Returns a diagnosis intake that passes Diagnosis_process.validate_patient_data.
+    Red flag answers are all negative unless red_flags is True, so the intake
+    reaches the LLM.
+    """
+    from Diagnosis_process import QUESTIONS
+    from red_flags import RED_FLAG_RULES
+
+    rng = random.Random(seed)
+    choices = {
+        "patient's chief complaint": ["neck pain", "neck and shoulder pain"],
+        "patient's location": ["middle", "right", "left"],
+        "patient's radiation": ["no", "yes right arm"],
+        "patient's severity": ["mild", "moderate", "severe"],
+        "patient's pain increase": ["aching", "opposite", "same"],
+        "patient's onset of pain": ["2 days ago", "1 week ago"],
+        "patient's age": [str(a) for a in range(20, 50)],
+        "patient's arm lift score": [str(s) for s in range(0, 6)],
+        "patient's Babinski Reflex": ["positive", "negative"],
+        "patient's Spurling test": ["positive", "negative"],
+    }
+    intake = {key: rng.choice(choices.get(key, ["yes", "no"])) for key, _, _ in QUESTIONS}
+    if not red_flags:
+        for _, key, _ in RED_FLAG_RULES:
+            intake[key] = "no" if key != "patient's age" else intake[key]
+    return intake
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Caches default to RECONECT_CACHE_DIR at import time; keep tests out of the user's cache
+os.environ["RECONECT_CACHE_DIR"] = tempfile.mkdtemp(prefix="reconect-tests-")
+# The workflow modules are flat scripts; the synthetic data helpers live with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "Re-ConECT"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+PATIENT_ID = "P000000"
+CONTEXT = {i: {"query": "summary of the guideline"} for i in range(4)}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """
+    ReConECTService over the fake chat model, an in-memory score store and
+    one synthetic patient (PATIENT_ID) with 10 daily sessions. Context
+    summaries are stubbed, so no corpus is loaded or indexed.
+    """
+    import Diagnosis_process
+    import Rehabilitation_assessment
+    from fakes import FakeChatModel
+    from score_store import ScoreStore
+    from service import ReConECTService
+    from synthetic import write_patient_csvs
+
+    for module in (Diagnosis_process, Rehabilitation_assessment):
+        monkeypatch.setattr(module, "resolve_context", lambda *args, **kwargs: CONTEXT)
+    scores_dir = str(tmp_path / "scores")
+    write_patient_csvs(scores_dir, n_patients=1, sessions=10)
+    return ReConECTService(FakeChatModel(), [[] for _ in range(8)], store=ScoreStore(":memory:"),
+                           scores_dir=scores_dir)
@@ -0,0 +1,100 @@
+import asyncio
+import csv
+import json
+import os
+
+from batch import _from_csv_row, completed_ids, run_batch, truncate_partial_line
+from conftest import PATIENT_ID
+from score_store import NUM_ITEMS
+
+PATIENT_INFO = {"disability": "Stroke", "functional_evaluation": "CUE-T", "new_symptoms": "none"}
+
+
+def assessment(intake_id, **fields):
+    return dict({"id": intake_id, "workflow": "assessment", "patient_id": PATIENT_ID,
+                 "scores": [2] * NUM_ITEMS, "patient_info": PATIENT_INFO}, **fields)
+
+
+def write_jsonl(path, intakes):
+    with open(path, "w", encoding="utf-8") as f:
+        for intake in intakes:
+            f.write(json.dumps(intake) + "\n")
+
+
+def session_count(store):
+    return store._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def test_truncate_partial_line(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    with open(path, "w") as f:
+        f.write('{"id": "1", "status": "ok"}\n{"id": "0", "status": "ok", "res')
+    truncate_partial_line(path)
+    assert open(path).read() == '{"id": "1", "status": "ok"}\n'
+    truncate_partial_line(path)
+    assert open(path).read() == '{"id": "1", "status": "ok"}\n'
+
+    with open(path, "w") as f:
+        f.write('{"id": "0", "sta')
+    truncate_partial_line(path)
+    assert open(path).read() == ""
+
+
+def test_resume_after_crash_keeps_file_parsable(tmp_path, service):
+    input_path = str(tmp_path / "in.jsonl")
+    output_path = str(tmp_path / "out.jsonl")
+    write_jsonl(input_path, [assessment("0"), assessment("1"), assessment("2")])
+
+    counts = asyncio.run(run_batch(service, input_path, output_path))
+    assert counts == {"ok": 3, "error": 0, "skipped": 0}
+    sessions = session_count(service.store)
+
+    # Simulate a crash while the last record was being written
+    last_id = json.loads(open(output_path).readlines()[-1])["id"]
+    with open(output_path, "rb+") as f:
+        f.truncate(os.path.getsize(output_path) - 20)
+    assert last_id not in completed_ids(output_path)
+
+    counts = asyncio.run(run_batch(service, input_path, output_path))
+    assert counts == {"ok": 1, "error": 0, "skipped": 2}
+    lines = open(output_path).read().splitlines()
+    assert all(json.loads(line) for line in lines)
+    assert completed_ids(output_path) == {"0", "1", "2"}
+    # The rerun intake's session was already recorded and is not recorded again
+    assert session_count(service.store) == sessions
+
+
+def test_session_recorded_once_per_intake_id(service):
+    service.assess_sync(assessment("a"))
+    service.assess_sync(assessment("a"))
+    service.assess_sync(assessment("b", record="false"))
+    service.assess_sync(assessment(None))
+    imported = session_count(service.store) - 2
+    assert imported == 10
+
+
+def test_csv_booleans_are_parsed():
+    row = {"id": "1", "full_assessment": "false", "record": "Yes"}
+    assert _from_csv_row(row) == {"id": "1", "full_assessment": False, "record": True}
+    assert _from_csv_row({"id": "2", "full_assessment": "maybe"})["full_assessment"] == "maybe"
+
+
+def test_csv_full_assessment_false_keeps_the_urgent_result(tmp_path, service):
+    from Diagnosis_process import QUESTIONS
+    from synthetic import synthetic_intake
+
+    intake = dict(synthetic_intake(0), **{"patient's fever": "yes"})
+    input_path = str(tmp_path / "in.csv")
+    output_path = str(tmp_path / "out.jsonl")
+    with open(input_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ["id", "workflow", "full_assessment"] + [key for key, _, _ in QUESTIONS])
+        writer.writeheader()
+        writer.writerow(dict(intake, id="1", workflow="diagnosis", full_assessment="false"))
+        writer.writerow(dict(intake, id="2", workflow="diagnosis", full_assessment="maybe"))
+
+    service.llm = None  # a full assessment would fail
+    counts = asyncio.run(run_batch(service, input_path, output_path))
+    records = {r["id"]: r for r in map(json.loads, open(output_path))}
+    assert counts == {"ok": 1, "error": 1, "skipped": 0}
+    assert records["1"]["urgent"] and "Urgent hospital visit" in records["1"]["result"]
+    assert records["2"]["error"] == "invalid boolean 'maybe'"
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from bm25_index import BM25IndexStore
+from document_cache import DocumentCache, atomic_write, evict_lru, touch
+from synthetic import synthetic_pages
+
+
+def write_files(directory, names, size=10):
+    for age, name in enumerate(names):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        # Oldest first: names[0] is the least recently used
+        os.utime(path, ns=(age * 10**9, age * 10**9))
+
+
+def test_atomic_write_leaves_no_partial_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    atomic_write(path, lambda f: f.write("{}"), "w")
+
+    def fail(f):
+        f.write("partial")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, fail, "w")
+    assert open(path).read() == "{}"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_evict_lru_removes_oldest_first(tmp_path):
+    write_files(str(tmp_path), ["a.blob", "b.blob", "c.blob", "d.blob", "other.txt"])
+    touch(str(tmp_path / "a.blob"))
+    assert evict_lru(str(tmp_path), ".blob", max_entries=2, max_bytes=1 << 20) == 2
+    assert sorted(os.listdir(tmp_path)) == ["a.blob", "d.blob", "other.txt"]
+
+
+def test_evict_lru_keeps_protected_entries(tmp_path):
+    write_files(str(tmp_path), ["a.blob", "b.blob", "c.blob"])
+    assert evict_lru(str(tmp_path), ".blob", max_entries=1, max_bytes=1 << 20, protected={"a"}) == 2
+    assert os.listdir(tmp_path) == ["a.blob"]
+    assert evict_lru(str(tmp_path), ".blob", max_entries=0, max_bytes=15, protected={"a"}) == 0
+
+
+def test_document_cache_evicts_least_recently_used(tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache"), max_entries=2)
+    sources = []
+    for i in range(3):
+        path = tmp_path / f"doc_{i}.pdf"
+        path.write_bytes(b"%PDF " + bytes([i]))
+        sources.append(str(path))
+        cache.put(str(path), {}, synthetic_pages(f"doc_{i}", 1, 100))
+        os.utime(cache._entry_path(str(path), {}), ns=(i * 10**9, i * 10**9))
+        if i == 1:
+            assert cache.get(sources[0], {}) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(sources[0], {}) is not None
+    assert cache.get(sources[1], {}) is None
+
+
+def test_bm25_store_never_evicts_named_indexes(tmp_path):
+    store = BM25IndexStore(str(tmp_path / "bm25"), max_entries=1)
+    named = synthetic_pages("named", 1, 300)
+    store.add("guideline", named)
+    for i in range(3):
+        store.get(synthetic_pages(f"doc_{i}", 1, 300))
+    files = [name for name in os.listdir(tmp_path / "bm25") if name.endswith(".pkl.z")]
+    assert len(files) == 2
+    assert BM25IndexStore(str(tmp_path / "bm25")).retriever("guideline") is not None
@@ -0,0 +1,56 @@
+from langchain_core.documents import Document
+
+from context_packing import (
+    count_tokens,
+    dedupe_chunks,
+    fit_to_budget,
+    pack_documents,
+    pack_summaries,
+    strip_html,
+    truncate_to_budget,
+)
+
+
+def test_strip_html_keeps_comparisons():
+    assert strip_html("age <20 or >50 years") == "age <20 or >50 years"
+    assert strip_html("<p id='1'>Pain &lt; 3 days</p>\n<br/>Fever") == "Pain < 3 days Fever"
+
+
+def test_pack_summaries_keeps_comparisons():
+    summary = "Red flags: aged <20 or >50 years, fever."
+    assert pack_summaries({"query": summary}) == summary
+
+
+def test_overlapping_chunks_are_trimmed():
+    text = " ".join(f"word{i}" for i in range(60))
+    first, second = text[:300], text[250:]
+    chunks = dedupe_chunks([first, second])
+    assert chunks[0] == first
+    # Only the repeated 50 characters are removed, even though they start mid-word
+    assert first + chunks[1] == text
+    assert text[250:300] not in chunks[1]
+
+
+def test_contained_chunks_are_dropped():
+    text = "the shoulder flexion exercise is repeated ten times each morning " * 3
+    assert dedupe_chunks([text, text[:120]]) == [text]
+
+
+def test_truncate_at_sentence_end():
+    text = "First sentence here. Second one is a bit longer. Third sentence never fits in the budget."
+    assert truncate_to_budget(text, 13) == "First sentence here. Second one is a bit longer."
+    assert truncate_to_budget("no sentence end in this text at all", 4) == "no sentence end"
+    assert truncate_to_budget("short", 10) == "short"
+
+
+def test_fit_to_budget_fills_remainder_with_whole_sentences():
+    chunks = ["A" * 40, "Short one. And the rest of it goes on and on."]
+    assert fit_to_budget(chunks, 16) == "A" * 40 + "\n---\nShort one."
+    assert count_tokens(fit_to_budget(["x " * 5000], 100)) <= 100
+
+
+def test_pack_documents_strips_markup_and_fits_budget():
+    docs = [Document(page_content=f"<p>Sentence {i} about neck pain.</p>") for i in range(200)]
+    packed = pack_documents(docs, "neck pain", budget=50)
+    assert "<p>" not in packed
+    assert count_tokens(packed) <= 50
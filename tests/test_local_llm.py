@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from fakes import build_tiny_llama
+from local_llm import InferenceEngine, load_local_model
+
+HEADER = "You are a renowned rehabilitation medicine specialist. " * 12
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    return load_local_model(build_tiny_llama(str(tmp_path_factory.mktemp("tiny-llama"))))
+
+
+def prompts(n):
+    return [f"{HEADER}\nPatient {i}: neck pain\nAssessment:" for i in range(n)]
+
+
+def run(engine, texts, max_new_tokens=4):
+    futures = [engine.submit(text, max_new_tokens) for text in texts]
+    return [future.result(timeout=60)["text"] for future in futures]
+
+
+def test_prefix_failure_falls_back_to_full_prefill(tiny_model):
+    tokenizer, model = tiny_model
+    reference = InferenceEngine(tokenizer, model, max_prefixes=0)
+    expected = run(reference, prompts(4))
+    reference.close()
+
+    engine = InferenceEngine(tokenizer, model, min_prefix_tokens=16)
+
+    def out_of_memory(ids):
+        raise RuntimeError("out of memory")
+
+    engine._prefix_for = out_of_memory
+    assert run(engine, prompts(4)) == expected
+    assert engine._worker.is_alive()
+    engine.close()
+
+
+def test_failed_batch_does_not_stop_the_worker(tiny_model):
+    tokenizer, model = tiny_model
+    engine = InferenceEngine(tokenizer, model, max_prefixes=0)
+    generate = engine._generate
+
+    def out_of_memory(*args):
+        raise RuntimeError("out of memory")
+
+    engine._generate = out_of_memory
+    with pytest.raises(RuntimeError, match="out of memory"):
+        engine.submit(prompts(1)[0], 4).result(timeout=60)
+
+    engine._generate = generate
+    assert len(run(engine, prompts(2))) == 2
+    engine.close()
+
+
+def test_prefix_cache_matches_full_prefill(tiny_model):
+    tokenizer, model = tiny_model
+    plain = InferenceEngine(tokenizer, model, max_prefixes=0)
+    cached = InferenceEngine(tokenizer, model, min_prefix_tokens=16)
+    texts = prompts(6)
+    assert run(cached, texts[:3]) + run(cached, texts[3:]) == run(plain, texts)
+    assert cached.stats()["cached_tokens"] > 0
+    plain.close()
+    cached.close()
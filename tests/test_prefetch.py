@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+import prefetch
+from document_registry import DocumentRegistry
+from fakes import FakeChatModel, fake_loader_factory
+
+
+def counting_registry(tmp_path, latency=0.2, n_docs=8):
+    calls = []
+    lock = threading.Lock()
+    factory = fake_loader_factory(latency=latency, pages=1, page_chars=100)
+
+    def loader_factory(pdf_file, **options):
+        with lock:
+            calls.append(pdf_file)
+        return factory(pdf_file, **options)
+
+    paths = []
+    for i in range(n_docs):
+        path = tmp_path / f"doc_{i}.pdf"
+        path.write_bytes(b"%PDF synthetic " + bytes([i]))
+        paths.append(str(path))
+    registry = DocumentRegistry(paths, cache=False, max_workers=4, loader_factory=loader_factory, verbose=False)
+    return registry, calls
+
+
+def test_access_waits_for_an_in_flight_preload(tmp_path):
+    registry, calls = counting_registry(tmp_path)
+    indices = [0, 1, 2, 5]
+    worker = threading.Thread(target=registry.preload, args=(indices,))
+    worker.start()
+    time.sleep(0.05)
+    docs_list = [registry[i] for i in indices]
+    worker.join()
+    assert len(calls) == len(indices)
+    assert all(docs_list)
+
+
+def test_failed_load_is_retried_by_a_waiting_reader(tmp_path, monkeypatch):
+    registry, calls = counting_registry(tmp_path, latency=0.0)
+    failures = [1]
+
+    def flaky(pdf_files, **kwargs):
+        if failures:
+            failures.pop()
+            raise OSError("loader failed")
+        return [[pdf_file] for pdf_file in pdf_files]
+
+    monkeypatch.setattr("document_registry.load_documents", flaky)
+    with pytest.raises(OSError):
+        registry.preload([0])
+    assert registry[0] == [registry.pdf_files[0]]
+
+
+def test_cancel_stops_before_the_summaries(tmp_path, monkeypatch):
+    registry, calls = counting_registry(tmp_path, latency=0.3)
+    resolved = []
+    monkeypatch.setattr(prefetch, "resolve_context", lambda *args, **kwargs: resolved.append(1))
+
+    future = prefetch.prefetch_context(FakeChatModel(), registry, [0, 1], ["query"])
+    time.sleep(0.05)
+    prefetch.cancel(future)
+    with pytest.raises(CancelledError):
+        future.result()
+    assert resolved == []
+
+
+def test_uncancelled_prefetch_resolves(tmp_path, monkeypatch):
+    registry, _ = counting_registry(tmp_path, latency=0.0)
+    monkeypatch.setattr(prefetch, "resolve_context", lambda docs_list, *args, **kwargs: len(docs_list))
+    future = prefetch.prefetch_context(FakeChatModel(), registry, [0, 1, 2], ["query"])
+    assert prefetch.join("context", future) == 3
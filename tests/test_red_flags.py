@@ -0,0 +1,90 @@
+import pytest
+
+from Diagnosis_process import diagnose
+from fakes import FakeChatModel
+from red_flags import format_red_flag_result, screen_red_flags
+from synthetic import synthetic_intake
+
+AGE = "patient's age"
+FEVER = "patient's fever"
+
+
+def flags_of(patient_data):
+    return [f["flag"] for f in screen_red_flags(patient_data)]
+
+
+@pytest.mark.parametrize("age, flagged", [
+    ("19", True),
+    ("20", False),
+    ("50", False),
+    ("51", True),
+    (" 51 ", True),
+    (51, True),
+    ("unknown", False),
+])
+def test_age_outside_20_to_50(age, flagged):
+    assert bool(flags_of({AGE: age})) is flagged
+
+
+@pytest.mark.parametrize("answer", ["Yes", "yes", "YES", "Yes ", " yes\n"])
+def test_yes_answers_ignore_case_and_whitespace(answer):
+    assert flags_of({FEVER: answer}) == ["Fever"]
+
+
+@pytest.mark.parametrize("answer", ["No", "no ", "yes, mild", ""])
+def test_other_answers_are_not_flags(answer):
+    assert flags_of({FEVER: answer}) == []
+
+
+def test_missing_fields_are_not_flags():
+    assert screen_red_flags({}) == []
+    assert screen_red_flags({FEVER: None, AGE: None}) == []
+
+
+def test_flags_keep_the_evidence():
+    flags = screen_red_flags({FEVER: "Yes ", AGE: "67", "patient's osteoporosis": "no"})
+    assert flags == [
+        {"flag": "Fever", "field": FEVER, "answer": "Yes "},
+        {"flag": "Aged younger than 20 years or older than 50 years", "field": AGE, "answer": "67"},
+    ]
+    result = format_red_flag_result(flags)
+    assert result.startswith('finding red flags: Red flags present: "Fever", "Aged younger')
+    assert f"(evidence: {AGE} = 67)" in result
+
+
+class FailingChatModel(FakeChatModel):
+    """
+    Chat model that fails the test if the workflow calls it.
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise AssertionError("the LLM must not be called")
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        raise AssertionError("the LLM must not be called")
+
+
+NO_CONTEXT = {i: {} for i in range(4)}
+DOCS = [[] for _ in range(8)]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_diagnose_answers_red_flags_without_the_llm(stream):
+    intake = dict(synthetic_intake(0), **{FEVER: "yes", AGE: "67"})
+    tokens = []
+    result = diagnose(FailingChatModel(), DOCS, intake, stream=stream, on_token=tokens.append,
+                      result_context=NO_CONTEXT)
+    assert result == format_red_flag_result(screen_red_flags(intake))
+    assert "Urgent hospital visit recommended" in result
+    assert tokens == ([result] if stream else [])
+
+
+def test_diagnose_without_red_flags_calls_the_llm():
+    with pytest.raises(AssertionError, match="must not be called"):
+        diagnose(FailingChatModel(), DOCS, synthetic_intake(0), result_context=NO_CONTEXT)
+
+
+def test_screen_can_be_skipped():
+    intake = dict(synthetic_intake(0), **{FEVER: "yes"})
+    with pytest.raises(AssertionError, match="must not be called"):
+        diagnose(FailingChatModel(), DOCS, intake, red_flag_screen=False, result_context=NO_CONTEXT)
@@ -0,0 +1,32 @@
+from conftest import CONTEXT
+from Diagnosis_process import diagnose
+from fakes import FakeChatModel
+from response_cache import ResponseCache
+from synthetic import synthetic_corpus, synthetic_intake
+
+
+class SampledChatModel(FakeChatModel):
+    temperature: float = 0.0
+
+
+DOCS = synthetic_corpus(8, 1, 200)
+
+
+def run(llm, cache, intake):
+    return diagnose(llm, DOCS, intake, response_cache=cache, red_flag_screen=False, result_context=CONTEXT)
+
+
+def test_equivalent_intakes_share_a_response(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    intake = synthetic_intake(0)
+    first = run(SampledChatModel(response="first"), cache, intake)
+    shouting = {key: value.upper() + "  " for key, value in intake.items()}
+    assert run(SampledChatModel(response="second"), cache, shouting) == first == "first"
+
+
+def test_temperature_is_part_of_the_key(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    intake = synthetic_intake(0)
+    assert run(SampledChatModel(response="greedy"), cache, intake) == "greedy"
+    assert run(SampledChatModel(response="sampled", temperature=0.7), cache, intake) == "sampled"
+    assert run(SampledChatModel(response="other"), cache, intake) == "greedy"
@@ -0,0 +1,93 @@
+import csv
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from Rehabilitation_assessment import calculate_7day_average
+from score_store import NUM_ITEMS, ScoreStore
+from synthetic import write_patient_csvs
+
+END = datetime(2024, 8, 14, 12, 0)
+
+
+def assert_same_averages(actual, expected):
+    assert len(actual) == len(expected) == NUM_ITEMS
+    for a, e in zip(actual, expected):
+        assert (math.isnan(a) and math.isnan(e)) or a == pytest.approx(e)
+
+
+@pytest.fixture
+def histories(tmp_path):
+    return write_patient_csvs(str(tmp_path), n_patients=3, sessions=30, end=END)
+
+
+@pytest.mark.parametrize("date", ["2024-08-14", "2024-08-01", "2024-07-20", "2024-07-01"])
+def test_window_average_matches_csv(histories, date):
+    store = ScoreStore(":memory:")
+    for i, path in enumerate(histories):
+        store.import_csv(f"P{i}", path)
+    for i, path in enumerate(histories):
+        assert_same_averages(store.seven_day_average(f"P{i}", date), calculate_7day_average(path, date))
+
+
+def test_no_recent_sessions_average_to_nan(histories):
+    store = ScoreStore(":memory:")
+    store.import_csv("P0", histories[0])
+    averages = store.seven_day_average("P0", "2025-01-01")
+    assert all(math.isnan(a) for a in averages)
+    assert_same_averages(averages, calculate_7day_average(histories[0], "2025-01-01"))
+
+
+def test_out_of_order_append_matches_csv(histories):
+    path = histories[0]
+    store = ScoreStore(":memory:")
+    store.import_csv("P0", path)
+
+    when = END - timedelta(days=3, hours=-1)
+    scores = [4] * NUM_ITEMS
+    store.append("P0", scores, when)
+    store.append("P0", [0] * NUM_ITEMS, END - timedelta(days=20))
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([when.strftime("%Y-%m-%d %H:%M:%S")] + scores)
+        writer.writerow([(END - timedelta(days=20)).strftime("%Y-%m-%d %H:%M:%S")] + [0] * NUM_ITEMS)
+
+    for date in ["2024-08-14", "2024-07-28"]:
+        assert_same_averages(store.seven_day_average("P0", date), calculate_7day_average(path, date))
+
+
+def test_missing_scores_are_skipped(tmp_path):
+    store = ScoreStore(str(tmp_path / "scores.db"))
+    store.append("P0", [1.0] * NUM_ITEMS, "2024-08-10")
+    store.append("P0", [3.0] + [None] * (NUM_ITEMS - 1), "2024-08-12")
+    averages = store.seven_day_average("P0", "2024-08-14")
+    assert averages[0] == 2.0
+    assert averages[1:] == [1.0] * (NUM_ITEMS - 1)
+    assert store.has_patient("P0") and not store.has_patient("P1")
+
+
+def test_append_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        ScoreStore(":memory:").append("P0", [1] * (NUM_ITEMS - 1))
+
+
+def test_session_id_is_recorded_once(tmp_path):
+    path = str(tmp_path / "scores.db")
+    store = ScoreStore(path)
+    assert store.append("P0", [1.0] * NUM_ITEMS, "2024-08-10", session_id="a")
+    assert not store.append("P0", [4.0] * NUM_ITEMS, "2024-08-11", session_id="a")
+    assert store.append("P1", [4.0] * NUM_ITEMS, "2024-08-11", session_id="a")
+    store.close()
+
+    reopened = ScoreStore(path)
+    assert not reopened.append("P0", [4.0] * NUM_ITEMS, "2024-08-12", session_id="a")
+    assert reopened.seven_day_average("P0", "2024-08-14") == [1.0] * NUM_ITEMS
+
+
+def test_import_csv_if_absent(histories):
+    store = ScoreStore(":memory:")
+    assert store.import_csv_if_absent("P0", histories[0]) == 30
+    assert store.import_csv_if_absent("P0", histories[0]) == 0
+    assert_same_averages(store.seven_day_average("P0", "2024-08-14"),
+                         calculate_7day_average(histories[0], "2024-08-14"))
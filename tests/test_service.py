@@ -0,0 +1,161 @@
+import asyncio
+import csv
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import PATIENT_ID
+from fakes import FakeChatModel
+from score_store import NUM_ITEMS, ScoreStore
+from service import _handle
+from synthetic import synthetic_intake
+
+PATIENT_INFO = {"disability": "Stroke", "functional_evaluation": "CUE-T", "new_symptoms": "none"}
+
+
+def assessment(**fields):
+    return dict({"patient_id": PATIENT_ID, "scores": [2] * NUM_ITEMS, "patient_info": PATIENT_INFO}, **fields)
+
+
+def session_count(store, patient_id=PATIENT_ID):
+    return store._conn.execute("SELECT COUNT(*) FROM sessions WHERE patient_id = ?", (patient_id,)).fetchone()[0]
+
+
+def test_diagnosis_calls_the_model(service):
+    result = service.diagnose_sync(synthetic_intake(0))
+    assert result == {"result": FakeChatModel().response, "urgent": False, "red_flags": []}
+
+
+def test_diagnosis_red_flags_skip_the_model(service):
+    service.llm = None
+    result = service.diagnose_sync(dict(synthetic_intake(0), **{"patient's fever": "yes"}))
+    assert result["urgent"] and [f["flag"] for f in result["red_flags"]] == ["Fever"]
+    assert "Urgent hospital visit recommended" in result["result"]
+
+
+def test_diagnosis_rejects_invalid_intakes(service):
+    with pytest.raises(ValueError, match="missing answer"):
+        service.diagnose_sync({})
+
+
+def test_assessment_against_csv_history(service):
+    result = service.assess_sync(assessment(scores=[0] * NUM_ITEMS))
+    assert result["patient_id"] == PATIENT_ID
+    assert len(result["average_scores"]) == NUM_ITEMS
+    assert result["decreased_items"]
+    assert result["warnings"] == []
+    assert result["result"] == FakeChatModel().response
+    # The history was imported and the new session recorded
+    assert session_count(service.store) == 11
+
+
+def test_assessment_without_recent_sessions_warns(service):
+    later = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
+    result = service.assess_sync(assessment(date=later))
+    assert result["average_scores"] == [None] * NUM_ITEMS
+    assert result["decreased_items"] == []
+    assert result["warnings"]
+
+
+def test_assessment_unknown_patient(service):
+    with pytest.raises(LookupError):
+        service.assess_sync(assessment(patient_id="nobody"))
+
+
+def test_assessment_rejects_bad_scores(service):
+    with pytest.raises(ValueError):
+        service.assess_sync(assessment(scores=[1] * 3))
+
+
+def test_concurrent_first_assessments_import_history_once(service, tmp_path):
+    path = os.path.join(service.scores_dir, "P-big.csv")
+    start = datetime(2024, 1, 1)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["datetime"] + [f"Item {i}" for i in range(1, NUM_ITEMS + 1)])
+        for day in range(200):
+            writer.writerow([(start + timedelta(days=day)).strftime("%Y-%m-%d %H:%M:%S")] + [3] * NUM_ITEMS)
+    service.store = ScoreStore(str(tmp_path / "scores.db"))
+
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def first_assessment():
+        barrier.wait()
+        try:
+            service.assess_sync(assessment(patient_id="P-big", record=False))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=first_assessment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert session_count(service.store, "P-big") == 200
+
+
+async def request(service, raw):
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        writer.write_eof()
+        response = await reader.read()
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+    head, _, body = response.decode("utf-8").partition("\r\n\r\n")
+    return int(head.split()[1]), body
+
+
+def post(service, path, payload, length=None):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    length = len(body) if length is None else length
+    raw = f"POST {path} HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode() + body
+    return asyncio.run(request(service, raw))
+
+
+def get(service, path):
+    return asyncio.run(request(service, f"GET {path} HTTP/1.1\r\n\r\n".encode()))
+
+
+def test_http_diagnosis(service):
+    status, body = post(service, "/diagnosis", synthetic_intake(0))
+    assert status == 200
+    assert json.loads(body)["result"] == FakeChatModel().response
+
+
+def test_http_assessment(service):
+    status, body = post(service, "/assessment", assessment())
+    assert status == 200
+    assert len(json.loads(body)["average_scores"]) == NUM_ITEMS
+
+
+@pytest.mark.parametrize("path, payload, length, expected", [
+    ("/diagnosis", {}, None, 400),
+    ("/diagnosis", b"not json", None, 400),
+    ("/diagnosis", b"[]", None, 400),
+    ("/diagnosis", b"{}", "abc", 400),
+    ("/diagnosis", b"{}", "-1", 400),
+    ("/diagnosis", b"{}", "10", 400),
+    ("/assessment", {"patient_id": "nobody", "scores": [1] * NUM_ITEMS, "patient_info": PATIENT_INFO}, None, 404),
+    ("/unknown", {}, None, 404),
+])
+def test_http_errors(service, path, payload, length, expected):
+    status, body = post(service, path, payload, length)
+    assert status == expected
+    assert "error" in json.loads(body)
+
+
+def test_http_get_routes(service):
+    assert get(service, "/health") == (200, '{"status": "ok"}')
+    assert get(service, "/metrics")[0] == 200
+    assert get(service, "/diagnosis")[0] == 405
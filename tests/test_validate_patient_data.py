@@ -0,0 +1,39 @@
+import pytest
+
+from Diagnosis_process import QUESTIONS, validate_patient_data
+from synthetic import synthetic_intake
+
+
+def test_valid_intake_passes():
+    intake = synthetic_intake(0)
+    assert validate_patient_data(intake) == intake
+
+
+def test_answers_are_stripped_and_stringified():
+    intake = dict(synthetic_intake(1), **{"patient's fever": " no ", "patient's age": 42})
+    validated = validate_patient_data(intake)
+    assert validated["patient's fever"] == "no"
+    assert validated["patient's age"] == "42"
+
+
+def test_unknown_keys_are_dropped():
+    validated = validate_patient_data(dict(synthetic_intake(2), extra="ignored"))
+    assert set(validated) == {key for key, _, _ in QUESTIONS}
+
+
+def test_missing_answer_is_reported():
+    intake = synthetic_intake(3)
+    del intake["patient's fever"]
+    with pytest.raises(ValueError, match="missing answer for \"patient's fever\""):
+        validate_patient_data(intake)
+
+
+def test_all_errors_are_reported_together():
+    intake = dict(synthetic_intake(4), **{"patient's age": "200", "patient's Spurling test": "maybe"})
+    del intake["patient's HIV status"]
+    with pytest.raises(ValueError) as excinfo:
+        validate_patient_data(intake)
+    message = str(excinfo.value)
+    assert "invalid answer for \"patient's age\": '200'" in message
+    assert "invalid answer for \"patient's Spurling test\": 'maybe'" in message
+    assert "missing answer for \"patient's HIV status\"" in message